@@ -80,16 +80,20 @@ def check_model_files():
     print("=" * 60)
 
     model_dir = 'models/skincare_ml'
+    # 每项接受新格式或旧版 pickle
     required_models = [
-        'tfidf_vectorizer.pkl',
-        'tfidf_matrix.pkl',
-        'knn_model.pkl',
-        'products_data.pkl'
+        ('tfidf_vectorizer.joblib', 'tfidf_vectorizer.pkl'),
+        ('tfidf_matrix.npz', 'tfidf_matrix.pkl'),
+        ('products_data.pkl',)
     ]
 
     all_exist = True
     if os.path.exists(model_dir):
-        for model_file in required_models:
+        for candidates in required_models:
+            model_file = next(
+                (f for f in candidates if os.path.exists(os.path.join(model_dir, f))),
+                candidates[0]
+            )
             model_path = os.path.join(model_dir, model_file)
             exists = os.path.exists(model_path)
             status = "✅" if exists else "❌"
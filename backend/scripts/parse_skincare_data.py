@@ -7,29 +7,13 @@ import re
 import os
 import sys
 from bs4 import BeautifulSoup
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from datetime import datetime
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import Base, SessionLocal, engine
-
-
-class SkincareProduct(Base):
-    """护肤品数据表"""
-    __tablename__ = 'skincare_products'
-
-    序号 = Column(Integer, primary_key=True)
-    平台 = Column(String(10), nullable=False)  # 'JD' or 'TB'
-    页数 = Column(Integer, nullable=False)
-    页内序号 = Column(Integer, nullable=False)
-    名称 = Column(String(500), nullable=False)
-    价格 = Column(Float, nullable=True)
-    用户评价数 = Column(String(50), nullable=True)  # 京东
-    用户购买数 = Column(String(50), nullable=True)  # 淘宝
-    推荐程度 = Column(Float, nullable=True)  # 基于序号计算
-    created_at = Column(DateTime, default=datetime.utcnow)
+from src.models.skincare_product import SkincareProduct
+from src.utils.cache import invalidate_cache
 
 
 def parse_jd_html(file_path, page_num):
@@ -239,6 +223,9 @@ def main():
         session.commit()
         print(f"✅ 成功插入 {len(all_products)} 条数据")
 
+        # 商品数据已更新，清除API缓存
+        invalidate_cache('skincare')
+
         # 统计信息
         print("\n数据统计:")
         print(f"  京东商品: {len(jd_products)} 条")
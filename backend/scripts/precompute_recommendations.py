@@ -0,0 +1,91 @@
+"""
+Recommendation Precomputation Script
+Generate and store recommendations for all active users (e.g. nightly)
+
+Usage:
+    python scripts/precompute_recommendations.py --n 10 --batch-size 500
+"""
+import argparse
+import logging
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select
+
+from src.config import SessionLocal
+from src.models import User
+from src.services.recommendation_service import RecommendationService
+
+logger = logging.getLogger(__name__)
+
+
+def precompute_recommendations(n_recommendations: int, batch_size: int) -> int:
+    """
+    Generate recommendations for all active users, batch_size users per
+    engine call (profiles, ratings and the INSERT are batched per call)
+
+    Returns:
+        Number of recommendations stored
+    """
+    service = RecommendationService()
+    session = SessionLocal()
+
+    try:
+        if not service.train_models(session):
+            logger.error("❌ Training failed")
+            return 0
+
+        user_ids = session.scalars(
+            select(User.user_id).where(User.is_active.is_(True)).order_by(User.user_id)
+        ).all()
+
+        stored = 0
+        for start in range(0, len(user_ids), batch_size):
+            recommendations = service.generate_recommendations_batch(
+                user_ids[start:start + batch_size],
+                n_recommendations=n_recommendations,
+                session=session
+            )
+            stored += sum(len(recs) for recs in recommendations.values())
+            logger.info("Processed %s/%s users",
+                        min(start + batch_size, len(user_ids)), len(user_ids))
+
+        return stored
+
+    finally:
+        session.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Precompute recommendations for all active users')
+
+    parser.add_argument(
+        '--n',
+        type=int,
+        default=10,
+        help='Recommendations per user (default: 10)'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=500,
+        help='Users per batch (default: 500)'
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+    )
+
+    stored = precompute_recommendations(args.n, args.batch_size)
+    print(f"\n✅ Stored {stored} recommendations")
+
+
+if __name__ == '__main__':
+    main()
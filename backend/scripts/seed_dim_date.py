@@ -3,26 +3,10 @@ Dimension Date Table Population Script
 Populates dim_date table with date dimension data for data warehouse
 """
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, Column, Integer, String, Date
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.config import Base, config
-
-
-class DimDate(Base):
-    """Date Dimension Table"""
-    __tablename__ = 'dim_date'
-
-    date_id = Column(Integer, primary_key=True)  # Format: YYYYMMDD
-    date = Column(Date, nullable=False, unique=True)
-    year = Column(Integer, nullable=False)
-    quarter = Column(Integer, nullable=False)
-    month = Column(Integer, nullable=False)
-    week = Column(Integer, nullable=False)
-    day_of_month = Column(Integer, nullable=False)
-    day_of_week = Column(Integer, nullable=False)  # 0=Monday, 6=Sunday
-    day_name = Column(String(10), nullable=False)
-    month_name = Column(String(10), nullable=False)
-    is_weekend = Column(Integer, nullable=False)  # 0=No, 1=Yes
+from src.models.dim_date import DimDate
 
 
 def generate_date_range(start_date, end_date):
@@ -3,11 +3,46 @@
 """
 import json
 import pickle
+import joblib
+import scipy.sparse as sp
 import os
-import jieba
+import sys
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.skincare_features import NameFeatureExtractor
+
+# 名称特征关键词（比线上默认词表多了部分品牌、功效和类型）
+FEATURE_KEYWORDS = [
+    # 1. 品牌关键词
+    ('品牌', [
+        '欧莱雅', '谷雨', '海蓝之谜', 'LA MER', '妮维雅', 'NIVEA',
+        '科颜氏', "Kiehl's", '自然堂', '兰蔻', '雅诗兰黛', '资生堂',
+        '欧诗漫', '百雀羚', '大宝', '韩束', '珀莱雅', '袋鼠妈妈',
+        '青蛙王子', '隆力奇', '蜜沐聆', 'ALORM', 'Losok', 'ORGINESE'
+    ]),
+    # 2. 功效关键词
+    ('功效', [
+        '美白', '保湿', '补水', '抗皱', '紧致', '淡斑', '祛斑',
+        '修护', '滋润', '提亮', '去黄', '抗氧化', '淡纹', '控油',
+        '舒缓', '提拉', '焕肤', '嫩肤', '御龄', '收缩毛孔', '改善'
+    ]),
+    # 3. 产品类型
+    ('类型', [
+        '面霜', '乳液', '精华', '水乳', '套装', '礼盒', '洁面',
+        '爽肤水', '晚霜', '日霜', '眼霜', '护手霜', '身体乳',
+        '面膜', '精萃水', '凝露', '凝胶', '洗面奶', '精华液'
+    ]),
+    # 4. 适用人群
+    ('人群', ['男士', '女', '孕妇', '儿童', '宝宝', '婴儿', '准孕妇']),
+    # 5. 规格相关
+    ('规格', ['套装', '礼盒', '旅行装', '小样', '正装']),
+]
+
+extract_name_features = NameFeatureExtractor(FEATURE_KEYWORDS)
 
 
 class SkincareMLRecommender:
@@ -16,62 +51,11 @@ class SkincareMLRecommender:
     def __init__(self):
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
-        self.knn_model = None
         self.products_data = []
 
     def extract_features_from_name(self, name):
         """从商品名称中提取特征"""
-        features = []
-
-        # 1. 提取品牌关键词
-        brands = [
-            '欧莱雅', '谷雨', '海蓝之谜', 'LA MER', '妮维雅', 'NIVEA',
-            '科颜氏', "Kiehl's", '自然堂', '兰蔻', '雅诗兰黛', '资生堂',
-            '欧诗漫', '百雀羚', '大宝', '韩束', '珀莱雅', '袋鼠妈妈',
-            '青蛙王子', '隆力奇', '蜜沐聆', 'ALORM', 'Losok', 'ORGINESE'
-        ]
-        for brand in brands:
-            if brand in name:
-                features.append(f'品牌_{brand}')
-
-        # 2. 提取功效关键词
-        effects = [
-            '美白', '保湿', '补水', '抗皱', '紧致', '淡斑', '祛斑',
-            '修护', '滋润', '提亮', '去黄', '抗氧化', '淡纹', '控油',
-            '舒缓', '提拉', '焕肤', '嫩肤', '御龄', '收缩毛孔', '改善'
-        ]
-        for effect in effects:
-            if effect in name:
-                features.append(f'功效_{effect}')
-
-        # 3. 提取产品类型
-        product_types = [
-            '面霜', '乳液', '精华', '水乳', '套装', '礼盒', '洁面',
-            '爽肤水', '晚霜', '日霜', '眼霜', '护手霜', '身体乳',
-            '面膜', '精萃水', '凝露', '凝胶', '洗面奶', '精华液'
-        ]
-        for ptype in product_types:
-            if ptype in name:
-                features.append(f'类型_{ptype}')
-
-        # 4. 提取适用人群
-        targets = ['男士', '女', '孕妇', '儿童', '宝宝', '婴儿', '准孕妇']
-        for target in targets:
-            if target in name:
-                features.append(f'人群_{target}')
-
-        # 5. 提取规格相关
-        specs = ['套装', '礼盒', '旅行装', '小样', '正装']
-        for spec in specs:
-            if spec in name:
-                features.append(f'规格_{spec}')
-
-        # 6. 使用jieba分词提取其他关键词
-        words = jieba.cut(name)
-        meaningful_words = [w for w in words if len(w) >= 2 and w not in ['的', '和', '与', '或']]
-        features.extend(meaningful_words[:5])
-
-        return ' '.join(features) if features else name
+        return extract_name_features(name)
 
     def load_data_from_json(self, json_path):
         """从JSON文件加载数据"""
@@ -135,52 +119,33 @@ class SkincareMLRecommender:
         for idx in top_indices:
             print(f"   - {feature_names[idx]}: {feature_scores[idx]:.4f}")
 
-    def train_knn(self):
-        """训练K-NN相似度模型"""
-        print("\n训练K-NN相似商品模型...")
-
-        n_neighbors = min(11, len(self.products_data))  # 确保不超过商品总数
-
-        self.knn_model = NearestNeighbors(
-            n_neighbors=n_neighbors,
-            metric='cosine',
-            algorithm='brute',
-            n_jobs=-1
-        )
-
-        self.knn_model.fit(self.tfidf_matrix)
-
-        print(f"✅ K-NN模型训练完成")
-        print(f"   - 使用算法: brute force")
-        print(f"   - 相似度度量: cosine")
-        print(f"   - 邻居数量: {n_neighbors - 1}")
-
     def save_model(self, model_dir='models/skincare_ml'):
         """保存模型（相对于backend目录）"""
         print(f"\n保存模型到 {model_dir}...")
 
         os.makedirs(model_dir, exist_ok=True)
 
-        # 保存TF-IDF向量化器
-        with open(f'{model_dir}/tfidf_vectorizer.pkl', 'wb') as f:
-            pickle.dump(self.tfidf_vectorizer, f)
+        # 保存TF-IDF向量化器（joblib：加载时numpy数组可内存映射）
+        joblib.dump(self.tfidf_vectorizer, f'{model_dir}/tfidf_vectorizer.joblib')
 
-        # 保存TF-IDF矩阵
-        with open(f'{model_dir}/tfidf_matrix.pkl', 'wb') as f:
-            pickle.dump(self.tfidf_matrix, f)
+        # 保存TF-IDF矩阵（scipy稀疏矩阵原生格式）
+        sp.save_npz(f'{model_dir}/tfidf_matrix.npz', self.tfidf_matrix.tocsr())
 
-        # 保存K-NN模型
-        with open(f'{model_dir}/knn_model.pkl', 'wb') as f:
-            pickle.dump(self.knn_model, f)
+        # 删除旧版文件，避免与新文件混用（K-NN模型已不再使用；相似商品表在加载时重新计算）
+        for name in ('tfidf_vectorizer.pkl', 'tfidf_matrix.pkl',
+                     'knn_model.pkl', 'knn_model.joblib',
+                     'similar_indices.npy', 'similar_scores.npy'):
+            legacy_path = os.path.join(model_dir, name)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
 
         # 保存商品数据
         with open(f'{model_dir}/products_data.pkl', 'wb') as f:
             pickle.dump(self.products_data, f)
 
         print("✅ 模型保存成功")
-        print(f"   - tfidf_vectorizer.pkl")
-        print(f"   - tfidf_matrix.pkl")
-        print(f"   - knn_model.pkl")
+        print(f"   - tfidf_vectorizer.joblib")
+        print(f"   - tfidf_matrix.npz")
         print(f"   - products_data.pkl ({len(self.products_data)} 个商品)")
 
 
@@ -200,9 +165,6 @@ def main():
     # 训练TF-IDF
     recommender.train_tfidf()
 
-    # 训练K-NN
-    recommender.train_knn()
-
     # 保存模型
     recommender.save_model()
 
@@ -6,6 +6,7 @@ Usage:
     python scripts/train_recommendation.py --output models/recommendation_v1.0.0.joblib
 """
 import argparse
+import pickle
 import sys
 import os
 from datetime import datetime
@@ -56,12 +57,16 @@ def train_and_save_model(output_path: str, model_version: str = None):
     session = SessionLocal()
 
     try:
-        success = service.train_models(session)
+        # Always retrain here; the result also refreshes the workers' model cache
+        success = service.train_models(session, use_cache=False)
 
         if not success:
             logger.error("❌ Training failed")
             return False
 
+        # Refresh the stored item-item similarities
+        service.save_item_similarities(session)
+
         # Prepare model metadata
         if model_version is None:
             model_version = f"v1.0.0_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -83,8 +88,8 @@ def train_and_save_model(output_path: str, model_version: str = None):
         # Create output directory if needed
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        # Save using joblib
-        joblib.dump(model_data, output_path)
+        # Save using joblib (uncompressed, so the arrays can be memory-mapped on load)
+        joblib.dump(model_data, output_path, protocol=pickle.HIGHEST_PROTOCOL)
         logger.info(f"\n✅ Model saved to: {output_path}")
 
         # Save metadata separately as JSON
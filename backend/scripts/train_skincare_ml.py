@@ -1,22 +1,26 @@
 """
 训练护肤品ML推荐模型
-使用scikit-learn的TF-IDF和K-NN算法
+使用scikit-learn的TF-IDF算法，相似商品按余弦相似度计算
 """
 import sys
 import os
 import pickle
+import joblib
+import scipy.sparse as sp
 import re
-import jieba
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import SessionLocal
-from scripts.parse_skincare_data import SkincareProduct
+from src.utils.cache import invalidate_cache
+from src.utils.ranking import top_k_neighbors
+from src.services.skincare_features import extract_name_features
+from src.models.skincare_product import SkincareProduct
 
 
 class SkincareMLRecommender:
@@ -25,65 +29,12 @@ class SkincareMLRecommender:
     def __init__(self):
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
-        self.knn_model = None
         self.products_data = []
         self.feature_names = []
 
     def extract_features_from_name(self, name):
         """从商品名称中提取特征"""
-        features = []
-
-        # 1. 提取品牌关键词
-        brands = [
-            '欧莱雅', '谷雨', '海蓝之谜', 'LA MER', '妮维雅', 'NIVEA',
-            '科颜氏', "Kiehl's", '自然堂', '兰蔻', '雅诗兰黛', '资生堂',
-            '欧诗漫', '百雀羚', '大宝', '韩束', '珀莱雅', '袋鼠妈妈',
-            '青蛙王子', '隆力奇', '蜜沐聆'
-        ]
-        for brand in brands:
-            if brand in name:
-                features.append(f'品牌_{brand}')
-
-        # 2. 提取功效关键词
-        effects = [
-            '美白', '保湿', '补水', '抗皱', '紧致', '淡斑', '祛斑',
-            '修护', '滋润', '提亮', '去黄', '抗氧化', '淡纹', '控油',
-            '舒缓', '提拉', '焕肤', '嫩肤', '御龄'
-        ]
-        for effect in effects:
-            if effect in name:
-                features.append(f'功效_{effect}')
-
-        # 3. 提取产品类型
-        product_types = [
-            '面霜', '乳液', '精华', '水乳', '套装', '礼盒', '洁面',
-            '爽肤水', '晚霜', '日霜', '眼霜', '护手霜', '身体乳',
-            '面膜', '精萃水', '凝露', '凝胶'
-        ]
-        for ptype in product_types:
-            if ptype in name:
-                features.append(f'类型_{ptype}')
-
-        # 4. 提取适用人群
-        targets = [
-            '男士', '女', '孕妇', '儿童', '宝宝', '婴儿', '准孕妇'
-        ]
-        for target in targets:
-            if target in name:
-                features.append(f'人群_{target}')
-
-        # 5. 提取规格相关
-        specs = ['套装', '礼盒', '旅行装', '小样', '正装']
-        for spec in specs:
-            if spec in name:
-                features.append(f'规格_{spec}')
-
-        # 6. 使用jieba分词提取其他关键词
-        words = jieba.cut(name)
-        meaningful_words = [w for w in words if len(w) >= 2 and w not in ['的', '和', '与', '或']]
-        features.extend(meaningful_words[:5])  # 只取前5个词
-
-        return ' '.join(features) if features else name
+        return extract_name_features(name)
 
     def load_data(self):
         """从数据库加载数据"""
@@ -143,42 +94,21 @@ class SkincareMLRecommender:
         for idx in top_indices:
             print(f"   - {self.feature_names[idx]}: {feature_scores[idx]:.4f}")
 
-    def train_knn(self):
-        """训练K-NN相似度模型"""
-        print("\n训练K-NN相似商品模型...")
-
-        self.knn_model = NearestNeighbors(
-            n_neighbors=11,        # 找11个邻居（包括自己，所以实际返回10个）
-            metric='cosine',       # 使用余弦相似度
-            algorithm='brute',     # 暴力搜索（数据量不大）
-            n_jobs=-1              # 使用所有CPU核心
-        )
-
-        self.knn_model.fit(self.tfidf_matrix)
-
-        print(f"✅ K-NN模型训练完成")
-        print(f"   - 使用算法: brute force")
-        print(f"   - 相似度度量: cosine")
-        print(f"   - 邻居数量: 10")
-
     def find_similar_products(self, product_idx, n_recommendations=10):
         """找到相似商品"""
         if product_idx >= len(self.products_data):
             return []
 
-        # 使用K-NN找相似商品
-        distances, indices = self.knn_model.kneighbors(
-            self.tfidf_matrix[product_idx],
-            n_neighbors=n_recommendations + 1  # +1因为会包含自己
-        )
+        # 与所有商品的余弦相似度，排除自己
+        similarities = cosine_similarity(self.tfidf_matrix[product_idx], self.tfidf_matrix)[0]
+        similarities[product_idx] = -np.inf
+        top_indices = np.argsort(-similarities, kind='stable')[:n_recommendations]
 
-        # 排除自己，返回相似商品
         similar_products = []
-        for i, (dist, idx) in enumerate(zip(distances[0][1:], indices[0][1:])):
-            similarity = 1 - dist  # 余弦距离转相似度
+        for i, idx in enumerate(top_indices):
             similar_products.append({
                 'product': self.products_data[idx],
-                'similarity': float(similarity),
+                'similarity': float(similarities[idx]),
                 'rank': i + 1
             })
 
@@ -222,28 +152,37 @@ class SkincareMLRecommender:
 
         os.makedirs(model_dir, exist_ok=True)
 
-        # 保存TF-IDF向量化器
-        with open(f'{model_dir}/tfidf_vectorizer.pkl', 'wb') as f:
-            pickle.dump(self.tfidf_vectorizer, f)
+        # 保存TF-IDF向量化器（joblib：加载时numpy数组可内存映射）
+        joblib.dump(self.tfidf_vectorizer, f'{model_dir}/tfidf_vectorizer.joblib')
+
+        # 保存TF-IDF矩阵（scipy稀疏矩阵原生格式）
+        sp.save_npz(f'{model_dir}/tfidf_matrix.npz', self.tfidf_matrix.tocsr())
 
-        # 保存TF-IDF矩阵
-        with open(f'{model_dir}/tfidf_matrix.pkl', 'wb') as f:
-            pickle.dump(self.tfidf_matrix, f)
+        # 预计算每个商品的Top 50相似商品（/similar 直接查表）
+        similar_indices, similar_scores = top_k_neighbors(normalize(self.tfidf_matrix), 50)
+        np.save(f'{model_dir}/similar_indices.npy', similar_indices)
+        np.save(f'{model_dir}/similar_scores.npy', similar_scores)
 
-        # 保存K-NN模型
-        with open(f'{model_dir}/knn_model.pkl', 'wb') as f:
-            pickle.dump(self.knn_model, f)
+        # 删除旧版文件，避免与新文件混用（K-NN模型已不再使用）
+        for name in ('tfidf_vectorizer.pkl', 'tfidf_matrix.pkl',
+                     'knn_model.pkl', 'knn_model.joblib'):
+            legacy_path = os.path.join(model_dir, name)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
 
         # 保存商品数据
         with open(f'{model_dir}/products_data.pkl', 'wb') as f:
             pickle.dump(self.products_data, f)
 
         print("✅ 模型保存成功")
-        print(f"   - tfidf_vectorizer.pkl")
-        print(f"   - tfidf_matrix.pkl")
-        print(f"   - knn_model.pkl")
+        print(f"   - tfidf_vectorizer.joblib")
+        print(f"   - tfidf_matrix.npz")
+        print(f"   - similar_indices.npy / similar_scores.npy")
         print(f"   - products_data.pkl")
 
+        # 模型已更新，清除模型信息缓存
+        invalidate_cache('skincare-ml')
+
     def test_recommendations(self):
         """测试推荐效果"""
         print("\n" + "="*60)
@@ -290,9 +229,6 @@ def main():
     # 训练TF-IDF
     recommender.train_tfidf()
 
-    # 训练K-NN
-    recommender.train_knn()
-
     # 保存模型
     recommender.save_model()
 
@@ -43,26 +43,18 @@ def check_rate_limit(identifier, limit, window=3600):
     key = f"rate_limit:{identifier}"
 
     try:
-        # Get current count
-        current = redis_client.get(key)
-
-        if current is None:
-            # First request in window
-            pipe = redis_client.pipeline()
-            pipe.set(key, 1, ex=window)
-            pipe.execute()
-            return True, limit - 1
-        else:
-            current = int(current)
-
-            if current >= limit:
-                # Rate limit exceeded
-                ttl = redis_client.ttl(key)
-                return False, 0
-            else:
-                # Increment counter
-                redis_client.incr(key)
-                return True, limit - current - 1
+        # One round trip: start the window if this is the first request
+        # (SET NX keeps the TTL of an existing window), then count this request
+        pipe = redis_client.pipeline()
+        pipe.set(key, 0, ex=window, nx=True)
+        pipe.incr(key)
+        _, current = pipe.execute()
+
+        if current > limit:
+            # Rate limit exceeded
+            return False, 0
+
+        return True, limit - current
 
     except Exception as e:
         print(f"Rate limiting error: {e}")
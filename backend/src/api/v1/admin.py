@@ -4,12 +4,10 @@
 """
 from flask import Blueprint, jsonify, request
 import os
-import sys
 import subprocess
 import threading
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.cache import invalidate_cache
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -20,9 +18,12 @@ task_status = {
     'train_model': {'status': 'idle', 'message': ''},
 }
 
+# 初始化/导入数据后清除的按用户缓存（用户画像、评分列表）
+USER_CACHE_NAMESPACES = ('profile', 'ratings')
 
-def run_script_async(script_name, task_key):
-    """异步运行脚本"""
+
+def run_script_async(script_name, task_key, invalidate=()):
+    """异步运行脚本，成功后清除 invalidate 中的缓存命名空间"""
     global task_status
     task_status[task_key] = {'status': 'running', 'message': '正在执行...'}
 
@@ -43,6 +44,8 @@ def run_script_async(script_name, task_key):
         )
 
         if result.returncode == 0:
+            for namespace in invalidate:
+                invalidate_cache(namespace)
             task_status[task_key] = {
                 'status': 'success',
                 'message': '执行成功',
@@ -73,7 +76,7 @@ def init_database():
         # 在新线程中运行
         thread = threading.Thread(
             target=run_script_async,
-            args=('init_database.py', 'init_database')
+            args=('init_database.py', 'init_database', USER_CACHE_NAMESPACES)
         )
         thread.start()
 
@@ -96,7 +99,7 @@ def import_data():
         # 在新线程中运行
         thread = threading.Thread(
             target=run_script_async,
-            args=('parse_skincare_data.py', 'import_data')
+            args=('parse_skincare_data.py', 'import_data', USER_CACHE_NAMESPACES)
         )
         thread.start()
 
@@ -163,18 +166,17 @@ def health_check():
         session.execute(text('SELECT 1'))
         session.close()
 
-        # 检查ML模型文件
+        # 检查ML模型文件（每项接受新格式或旧版 pickle）
         model_dir = 'models/skincare_ml'
         model_files = [
-            'tfidf_vectorizer.pkl',
-            'tfidf_matrix.pkl',
-            'knn_model.pkl',
-            'products_data.pkl'
+            ('tfidf_vectorizer.joblib', 'tfidf_vectorizer.pkl'),
+            ('tfidf_matrix.npz', 'tfidf_matrix.pkl'),
+            ('products_data.pkl',)
         ]
 
         models_exist = all([
-            os.path.exists(os.path.join(model_dir, f))
-            for f in model_files
+            any(os.path.exists(os.path.join(model_dir, f)) for f in candidates)
+            for candidates in model_files
         ])
 
         return jsonify({
@@ -192,6 +194,25 @@ def health_check():
         }), 500
 
 
+@admin_bp.route('/admin/db-pool', methods=['GET'])
+def db_pool_status():
+    """数据库连接池状态（排查连接等待/池耗尽）"""
+    from src.config import Config, engine
+
+    pool = engine.pool
+    return jsonify({
+        'success': True,
+        'pool': {
+            'size': pool.size(),
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'status': pool.status()
+        }
+    })
+
+
 @admin_bp.route('/admin/system-info', methods=['GET'])
 def system_info():
     """获取系统信息"""
@@ -214,7 +235,7 @@ def system_info():
 
         if os.path.exists(model_dir):
             for f in os.listdir(model_dir):
-                if f.endswith('.pkl'):
+                if f.endswith(('.pkl', '.npz', '.joblib')):
                     path = os.path.join(model_dir, f)
                     size = os.path.getsize(path)
                     model_info[f] = f"{size / 1024:.1f} KB"
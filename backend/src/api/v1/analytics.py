@@ -2,20 +2,126 @@
 Analytics API Endpoints
 Provides dashboard metrics and trend data
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from src.api.middleware.rate_limiter import rate_limit
 from src.config import SessionLocal
 from src.models import User, Product, Recommendation, UserRating, UserInteraction
-from sqlalchemy import func, desc, text
+from src.services.skincare_catalog import (
+    get_skincare_catalog, EFFECT_NAMES, PLATFORM_JD, PLATFORM_TB
+)
+from src.utils.cache import TTLCache, make_cache_key
+from src.utils.keyword_matcher import get_keyword_matcher
+from src.utils.ranking import top_k_indices
+from sqlalchemy import func, desc, text, select, literal_column
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
-import pickle
-import os
+import time
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 analytics_bp = Blueprint('analytics', __name__)
 
+# 价格区间（左闭右开）
+PRICE_RANGES = {
+    '经济实惠 (0-100元)': (0, 100),
+    '中端选择 (100-300元)': (100, 300),
+    '高端产品 (300-800元)': (300, 800),
+    '奢华系列 (800元以上)': (800, 100000)
+}
+# 区间首尾相接，边界 = 各区间下限 + 最后一个上限
+_PRICE_RANGE_EDGES = np.array(
+    [min_p for min_p, _ in PRICE_RANGES.values()] + [list(PRICE_RANGES.values())[-1][1]]
+)
+
+
+# 报告响应缓存（键包含商品数据版本，数据更新后自动失效）
+_report_cache = TTLCache(maxsize=512, ttl=300)
+
+
+# Dashboard aggregates are independent of each other, so they run concurrently
+# (each on its own session; the engine's pool is shared between threads)
+_dashboard_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard')
+DASHBOARD_QUERY_TIMEOUT = 2.0  # seconds, for the whole set of queries
+
+
+def _run_query(query_fn, *args):
+    """Run query_fn(session, *args) in a short-lived session"""
+    session = SessionLocal()
+    try:
+        return query_fn(session, *args)
+    finally:
+        session.close()
+
+
+def _count_users(session, skin_type):
+    user_query = session.query(func.count(User.user_id))
+    if skin_type:
+        user_query = user_query.filter(User.skin_type == skin_type)
+    return user_query.scalar()
+
+
+def _count_products(session):
+    return session.query(func.count(Product.product_id)).filter(
+        Product.is_available == True
+    ).scalar()
+
+
+def _count_recommendations(session):
+    return session.query(func.count(Recommendation.recommendation_id)).scalar()
+
+
+def _count_ratings(session):
+    return session.query(func.count(UserRating.rating_id)).scalar()
+
+
+def _average_rating(session):
+    avg_rating = session.query(func.avg(UserRating.rating)).scalar()
+    return float(avg_rating) if avg_rating else 0.0
+
+
+def _skin_type_distribution(session):
+    skin_type_dist = session.query(
+        User.skin_type,
+        func.count(User.user_id)
+    ).group_by(User.skin_type).all()
+
+    return [
+        {'skin_type': st, 'count': count}
+        for st, count in skin_type_dist if st is not None
+    ]
+
+
+def _category_distribution(session):
+    category_dist = session.query(
+        Product.category,
+        func.count(Product.product_id)
+    ).filter(Product.is_available == True).group_by(Product.category).all()
+
+    return [
+        {'category': cat, 'count': count}
+        for cat, count in category_dist
+    ]
+
+
+def _top_rated_products(session):
+    top_products = session.query(Product).filter(
+        Product.is_available == True,
+        Product.avg_rating.isnot(None)
+    ).order_by(desc(Product.avg_rating)).limit(5).all()
+
+    return [
+        {
+            'product_id': p.product_id,
+            'name': p.name,
+            'brand': p.brand,
+            'avg_rating': float(p.avg_rating),
+            'review_count': p.review_count,
+        }
+        for p in top_products
+    ]
+
 
 @analytics_bp.route('/analytics/dashboard', methods=['GET'])
 @rate_limit(limit=100)
@@ -32,93 +138,58 @@ def get_dashboard_metrics():
     try:
         skin_type = request.args.get('skin_type')
 
-        session = SessionLocal()
+        futures = {
+            'total_users': _dashboard_executor.submit(_run_query, _count_users, skin_type),
+            'total_products': _dashboard_executor.submit(_run_query, _count_products),
+            'total_recommendations': _dashboard_executor.submit(_run_query, _count_recommendations),
+            'total_ratings': _dashboard_executor.submit(_run_query, _count_ratings),
+            'avg_rating': _dashboard_executor.submit(_run_query, _average_rating),
+            'skin_types': _dashboard_executor.submit(_run_query, _skin_type_distribution),
+            'categories': _dashboard_executor.submit(_run_query, _category_distribution),
+            'top_products': _dashboard_executor.submit(_run_query, _top_rated_products),
+        }
 
+        deadline = time.monotonic() + DASHBOARD_QUERY_TIMEOUT
         try:
-            # Total users
-            user_query = session.query(func.count(User.user_id))
-            if skin_type:
-                user_query = user_query.filter(User.skin_type == skin_type)
-            total_users = user_query.scalar()
-
-            # Total products
-            total_products = session.query(func.count(Product.product_id)).filter(
-                Product.is_available == True
-            ).scalar()
-
-            # Total recommendations
-            total_recommendations = session.query(func.count(Recommendation.recommendation_id)).scalar()
-
-            # Total ratings
-            total_ratings = session.query(func.count(UserRating.rating_id)).scalar()
-
-            # Average rating
-            avg_rating = session.query(func.avg(UserRating.rating)).scalar()
-            avg_rating = float(avg_rating) if avg_rating else 0.0
-
-            # User distribution by skin type
-            skin_type_dist = session.query(
-                User.skin_type,
-                func.count(User.user_id)
-            ).group_by(User.skin_type).all()
-
-            skin_type_distribution = [
-                {'skin_type': st, 'count': count}
-                for st, count in skin_type_dist if st is not None
-            ]
-
-            # Product category distribution
-            category_dist = session.query(
-                Product.category,
-                func.count(Product.product_id)
-            ).filter(Product.is_available == True).group_by(Product.category).all()
-
-            category_distribution = [
-                {'category': cat, 'count': count}
-                for cat, count in category_dist
-            ]
-
-            # Top rated products
-            top_products = session.query(Product).filter(
-                Product.is_available == True,
-                Product.avg_rating.isnot(None)
-            ).order_by(desc(Product.avg_rating)).limit(5).all()
-
-            top_products_list = [
-                {
-                    'product_id': p.product_id,
-                    'name': p.name,
-                    'brand': p.brand,
-                    'avg_rating': float(p.avg_rating),
-                    'review_count': p.review_count,
-                }
-                for p in top_products
-            ]
-
-            return jsonify({
-                'success': True,
-                'metrics': {
-                    'total_users': total_users,
-                    'total_products': total_products,
-                    'total_recommendations': total_recommendations,
-                    'total_ratings': total_ratings,
-                    'average_rating': round(avg_rating, 2),
-                },
-                'distributions': {
-                    'skin_types': skin_type_distribution,
-                    'categories': category_distribution,
-                },
-                'top_products': top_products_list,
-            }), 200
+            results = {
+                name: future.result(timeout=max(deadline - time.monotonic(), 0))
+                for name, future in futures.items()
+            }
+        except Exception:
+            for future in futures.values():
+                future.cancel()
+            raise
 
-        finally:
-            session.close()
+        return jsonify({
+            'success': True,
+            'metrics': {
+                'total_users': results['total_users'],
+                'total_products': results['total_products'],
+                'total_recommendations': results['total_recommendations'],
+                'total_ratings': results['total_ratings'],
+                'average_rating': round(results['avg_rating'], 2),
+            },
+            'distributions': {
+                'skin_types': results['skin_types'],
+                'categories': results['categories'],
+            },
+            'top_products': results['top_products'],
+        }), 200
 
     except Exception as e:
-        logger.error(f"Error getting dashboard metrics: {e}", exc_info=True)
+        logger.error("Error getting dashboard metrics: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def _day_bucket(column, dialect_name):
+    """Truncate a timestamp column to its day"""
+    if dialect_name == 'postgresql':
+        # Literal field name: a bound parameter would differ between the
+        # SELECT and GROUP BY expressions and PostgreSQL would reject the query
+        return func.date_trunc(literal_column("'day'"), column)
+    return func.date(column)
+
+
 @analytics_bp.route('/analytics/trends', methods=['GET'])
 @rate_limit(limit=100)
 def get_trends():
@@ -170,20 +241,23 @@ def get_trends():
                 for p in trending_products
             ]
 
-            # Recent ratings trend (ratings per day)
-            daily_ratings = session.query(
-                func.date(UserRating.reviewed_at).label('date'),
-                func.count(UserRating.rating_id).label('count'),
-                func.avg(UserRating.rating).label('avg_rating')
-            ).filter(
-                UserRating.reviewed_at >= threshold_date
-            ).group_by(
-                func.date(UserRating.reviewed_at)
-            ).order_by('date').all()
+            # Recent ratings trend (ratings per day).
+            # The range filter is on the bare column so it can use the reviewed_at index.
+            day = _day_bucket(UserRating.reviewed_at, session.get_bind().dialect.name).label('day')
+            daily_ratings = session.execute(
+                select(
+                    day,
+                    func.count(UserRating.rating_id).label('count'),
+                    func.avg(UserRating.rating).label('avg_rating')
+                )
+                .where(UserRating.reviewed_at >= threshold_date)
+                .group_by(day)
+                .order_by(day)
+            ).all()
 
             ratings_trend = [
                 {
-                    'date': str(r.date),
+                    'date': str(r.day)[:10],
                     'count': r.count,
                     'avg_rating': round(float(r.avg_rating), 2) if r.avg_rating else 0,
                 }
@@ -201,7 +275,7 @@ def get_trends():
             session.close()
 
     except Exception as e:
-        logger.error(f"Error getting trends: {e}", exc_info=True)
+        logger.error("Error getting trends: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -238,233 +312,236 @@ def generate_skincare_report():
         budget_range = data.get('budget_range', {'min': 0, 'max': 10000})
         report_type = data.get('report_type', 'comprehensive')
 
-        session = SessionLocal()
-
-        try:
-            # 加载ML模型数据
-            model_dir = 'models/skincare_ml'
-            products_data = []
-
-            if os.path.exists(f'{model_dir}/products_data.pkl'):
-                with open(f'{model_dir}/products_data.pkl', 'rb') as f:
-                    products_data = pickle.load(f)
-            else:
-                # 如果模型不存在，从数据库加载
-                from scripts.parse_skincare_data import SkincareProduct
-                products_query = session.query(SkincareProduct).all()
-                products_data = [{
-                    '序号': p.序号,
-                    '平台': p.平台,
-                    '名称': p.名称,
-                    '价格': float(p.价格) if p.价格 else 0.0,
-                    '推荐程度': float(p.推荐程度) if p.推荐程度 else 0.0,
-                    '用户评价数': p.用户评价数,
-                    '用户购买数': p.用户购买数
-                } for p in products_query]
-
-            # 构建搜索关键词
-            search_keywords = user_preferences
-            if skin_concerns:
-                search_keywords += ' ' + ' '.join(skin_concerns)
-
-            # 1. 筛选符合预算的商品
-            budget_products = [
-                p for p in products_data
-                if budget_range['min'] <= p['价格'] <= budget_range['max']
-            ]
-
-            if not budget_products:
-                budget_products = products_data
-
-            # 2. 根据关键词匹配商品
-            def calculate_relevance_score(product, keywords):
-                """计算商品与关键词的相关性分数"""
-                name = product['名称']
-                score = product['推荐程度']
+        # 商品目录（列式存储，按文件修改时间缓存）
+        catalog = get_skincare_catalog()
 
-                # 关键词匹配加分
-                for keyword in keywords.split():
-                    if keyword in name:
-                        score += 0.2
-
-                return score
-
-            # 为每个商品计算相关性分数
-            for product in budget_products:
-                product['relevance_score'] = calculate_relevance_score(product, search_keywords)
-
-            # 3. 按相关性和推荐程度排序
-            sorted_products = sorted(
-                budget_products,
-                key=lambda x: (x['relevance_score'], x['推荐程度']),
-                reverse=True
+        # 相同参数 + 相同商品数据 → 相同报告，直接返回缓存的响应体
+        cache_key = None
+        if catalog.version is not None:
+            cache_key = make_cache_key(
+                'skincare-report', user_preferences, skin_concerns, budget_range, report_type,
+            catalog.version
             )
+            if cache_key in request.if_none_match:
+                return Response(status=304, headers={'ETag': f'"{cache_key}"'})
+
+            cached_body = _report_cache.get(cache_key)
+            if cached_body is not None:
+                return _report_response(cached_body, cache_key)
+
+        # 构建搜索关键词
+        search_keywords = user_preferences
+        if skin_concerns:
+            search_keywords += ' ' + ' '.join(skin_concerns)
+
+        # 1. 筛选符合预算的商品
+        budget_mask = (
+            (catalog.price >= budget_range['min']) & (catalog.price <= budget_range['max'])
+        )
+        budget_idx = np.flatnonzero(budget_mask)
+
+        if not len(budget_idx):
+            budget_idx = np.arange(len(catalog))
+
+        # 2. 根据关键词匹配商品（所有关键词一次扫描）
+        keyword_list = search_keywords.split()
+        keyword_matcher = get_keyword_matcher(tuple(keyword_list))
+
+        relevance = catalog.rec.copy()
+        for i in budget_idx:
+            matched = keyword_matcher.find(catalog.name[i])
+            # 关键词匹配加分
+            for keyword in keyword_list:
+                if keyword in matched:
+                    relevance[i] += 0.2
+
+        # 3. 按相关性和推荐程度排序：只对各部分用到的前K名做部分排序
+        #    （分数相同按推荐程度，再按原顺序）
+        budget_relevance = relevance[budget_idx]
+        budget_recs = catalog.rec[budget_idx]
+
+        def top_picks(mask, k):
+            """mask 选中的预算内商品中排名前 k 的目录下标"""
+            candidates = np.flatnonzero(mask)
+            ranked = top_k_indices(
+                budget_relevance[candidates], k, tiebreak=budget_recs[candidates]
+            )
+            return budget_idx[candidates[ranked]]
 
-            # 4. 生成报告的各个部分
-
-            # 4.1 Top推荐（前10名）
-            top_recommendations = sorted_products[:10]
+        def scored(indices):
+            """带相关性分数的商品（复制，不修改缓存中的商品）"""
+            return [
+                dict(catalog.products[i], relevance_score=float(relevance[i]))
+                for i in indices
+            ]
 
-            # 4.2 价格区间分析
-            price_ranges = {
-                '经济实惠 (0-100元)': (0, 100),
-                '中端选择 (100-300元)': (100, 300),
-                '高端产品 (300-800元)': (300, 800),
-                '奢华系列 (800元以上)': (800, 100000)
+        # 4. 生成报告的各个部分
+        prices = catalog.price[budget_idx]
+        recs = budget_recs
+
+        # 4.1 Top推荐（前10名）
+        top_recommendations = scored(
+            budget_idx[top_k_indices(budget_relevance, 10, tiebreak=budget_recs)]
+        )
+
+        # 4.2 价格区间分析
+        buckets = np.digitize(prices, _PRICE_RANGE_EDGES) - 1
+        in_range = (buckets >= 0) & (buckets < len(PRICE_RANGES))
+        bucket_counts = np.bincount(buckets[in_range], minlength=len(PRICE_RANGES))
+        bucket_price_sums = np.bincount(
+            buckets[in_range], weights=prices[in_range], minlength=len(PRICE_RANGES)
+        )
+        bucket_rec_sums = np.bincount(
+            buckets[in_range], weights=recs[in_range], minlength=len(PRICE_RANGES)
+        )
+
+        price_range_recommendations = {}
+        for k, range_name in enumerate(PRICE_RANGES):
+            count = int(bucket_counts[k])
+            price_range_recommendations[range_name] = {
+                'count': count,
+                'top_picks': scored(top_picks(buckets == k, 3)),
+                'avg_price': float(bucket_price_sums[k]) / count if count else 0,
+                'avg_recommendation_score': float(bucket_rec_sums[k]) / count if count else 0
             }
 
-            price_range_recommendations = {}
-            for range_name, (min_p, max_p) in price_ranges.items():
-                range_products = [
-                    p for p in sorted_products
-                    if min_p <= p['价格'] < max_p
-                ]
-                price_range_recommendations[range_name] = {
-                    'count': len(range_products),
-                    'top_picks': range_products[:3],
-                    'avg_price': sum(p['价格'] for p in range_products) / len(range_products) if range_products else 0,
-                    'avg_recommendation_score': sum(p['推荐程度'] for p in range_products) / len(range_products) if range_products else 0
-                }
-
-            # 4.3 功效分类推荐
-            effects_categories = {
-                '美白提亮': ['美白', '提亮', '去黄', '淡斑'],
-                '补水保湿': ['补水', '保湿', '滋润', '水润'],
-                '抗衰老': ['抗皱', '紧致', '提拉', '淡纹', '抗氧化'],
-                '修护舒缓': ['修护', '舒缓', '修复', '镇静'],
-                '控油清洁': ['控油', '清爽', '洁面', '去油']
+        # 4.3 功效分类推荐（功效标签在加载目录时已计算）
+        effect_tags = catalog.effect_tags[budget_idx]
+        effect_recommendations = {}
+        for col, effect_name in enumerate(EFFECT_NAMES):
+            effect_mask = effect_tags[:, col]
+            effect_recommendations[effect_name] = {
+                'count': int(effect_mask.sum()),
+                'top_picks': scored(top_picks(effect_mask, 5))
             }
 
-            effect_recommendations = {}
-            for effect_name, keywords in effects_categories.items():
-                effect_products = []
-                for product in sorted_products:
-                    if any(kw in product['名称'] for kw in keywords):
-                        effect_products.append(product)
-
-                effect_recommendations[effect_name] = {
-                    'count': len(effect_products),
-                    'top_picks': effect_products[:5]
-                }
-
-            # 4.4 平台对比分析
-            jd_products = [p for p in sorted_products if p['平台'] == 'JD']
-            tb_products = [p for p in sorted_products if p['平台'] == 'TB']
-
-            platform_analysis = {
-                '京东': {
-                    'total_count': len(jd_products),
-                    'avg_price': sum(p['价格'] for p in jd_products) / len(jd_products) if jd_products else 0,
-                    'avg_recommendation_score': sum(p['推荐程度'] for p in jd_products) / len(jd_products) if jd_products else 0,
-                    'top_picks': jd_products[:5]
-                },
-                '淘宝': {
-                    'total_count': len(tb_products),
-                    'avg_price': sum(p['价格'] for p in tb_products) / len(tb_products) if tb_products else 0,
-                    'avg_recommendation_score': sum(p['推荐程度'] for p in tb_products) / len(tb_products) if tb_products else 0,
-                    'top_picks': tb_products[:5]
-                }
+        # 4.4 平台对比分析
+        platforms = catalog.platform[budget_idx]
+        platform_analysis = {}
+        platform_counts = {}
+        for label, platform_code in (('京东', PLATFORM_JD), ('淘宝', PLATFORM_TB)):
+            platform_mask = platforms == platform_code
+            count = int(platform_mask.sum())
+            platform_counts[platform_code] = count
+            platform_analysis[label] = {
+                'total_count': count,
+                'avg_price': float(prices[platform_mask].sum()) / count if count else 0,
+                'avg_recommendation_score': (
+                    float(recs[platform_mask].sum()) / count if count else 0
+                ),
+                'top_picks': scored(top_picks(platform_mask, 5))
             }
+        jd_count = platform_counts[PLATFORM_JD]
+        tb_count = platform_counts[PLATFORM_TB]
+
+        # 4.5 数据统计摘要
+        n = len(budget_idx)
+        statistics = {
+            'total_products_analyzed': n,
+            'budget_range': budget_range,
+            'avg_price': float(prices.sum()) / n if n else 0,
+            'price_range': {
+                'min': float(prices.min()) if n else 0,
+                'max': float(prices.max()) if n else 0
+            },
+            'avg_recommendation_score': float(recs.sum()) / n if n else 0
+        }
 
-            # 4.5 数据统计摘要
-            statistics = {
-                'total_products_analyzed': len(sorted_products),
+        # 4.6 智能建议
+        smart_suggestions = []
+
+        # 预算建议
+        if budget_range['max'] < 100:
+            smart_suggestions.append({
+                'type': 'budget',
+                'message': '您的预算偏低，建议关注经济实惠型产品，性价比更高',
+                'action': '查看0-100元区间商品'
+            })
+        elif budget_range['max'] > 800:
+            smart_suggestions.append({
+                'type': 'budget',
+                'message': '您的预算充足，可以选择高端奢华系列，效果更佳',
+                'action': '查看800元以上商品'
+            })
+
+        # 平台建议
+        if jd_count > tb_count * 1.5:
+            smart_suggestions.append({
+                'type': 'platform',
+                'message': '京东平台有更多符合您需求的商品',
+                'action': '优先查看京东商品'
+            })
+        elif tb_count > jd_count * 1.5:
+            smart_suggestions.append({
+                'type': 'platform',
+                'message': '淘宝平台有更多符合您需求的商品',
+                'action': '优先查看淘宝商品'
+            })
+
+        # 功效建议
+        top_effect = max(effect_recommendations.items(), key=lambda x: x[1]['count'])
+        if top_effect[1]['count'] > 0:
+            smart_suggestions.append({
+                'type': 'effect',
+                'message': f'根据您的需求，我们找到{top_effect[1]["count"]}款{top_effect[0]}产品',
+                'action': f'查看{top_effect[0]}分类'
+            })
+
+        # 构建最终报告
+        report = {
+            'success': True,
+            'report_metadata': {
+                'generated_at': datetime.utcnow().isoformat(),
+                'user_preferences': user_preferences,
+                'skin_concerns': skin_concerns,
                 'budget_range': budget_range,
-                'avg_price': sum(p['价格'] for p in sorted_products) / len(sorted_products) if sorted_products else 0,
-                'price_range': {
-                    'min': min(p['价格'] for p in sorted_products) if sorted_products else 0,
-                    'max': max(p['价格'] for p in sorted_products) if sorted_products else 0
-                },
-                'avg_recommendation_score': sum(p['推荐程度'] for p in sorted_products) / len(sorted_products) if sorted_products else 0
-            }
-
-            # 4.6 智能建议
-            smart_suggestions = []
-
-            # 预算建议
-            if budget_range['max'] < 100:
-                smart_suggestions.append({
-                    'type': 'budget',
-                    'message': '您的预算偏低，建议关注经济实惠型产品，性价比更高',
-                    'action': '查看0-100元区间商品'
-                })
-            elif budget_range['max'] > 800:
-                smart_suggestions.append({
-                    'type': 'budget',
-                    'message': '您的预算充足，可以选择高端奢华系列，效果更佳',
-                    'action': '查看800元以上商品'
-                })
-
-            # 平台建议
-            if len(jd_products) > len(tb_products) * 1.5:
-                smart_suggestions.append({
-                    'type': 'platform',
-                    'message': '京东平台有更多符合您需求的商品',
-                    'action': '优先查看京东商品'
-                })
-            elif len(tb_products) > len(jd_products) * 1.5:
-                smart_suggestions.append({
-                    'type': 'platform',
-                    'message': '淘宝平台有更多符合您需求的商品',
-                    'action': '优先查看淘宝商品'
-                })
-
-            # 功效建议
-            top_effect = max(effect_recommendations.items(), key=lambda x: x[1]['count'])
-            if top_effect[1]['count'] > 0:
-                smart_suggestions.append({
-                    'type': 'effect',
-                    'message': f'根据您的需求，我们找到{top_effect[1]["count"]}款{top_effect[0]}产品',
-                    'action': f'查看{top_effect[0]}分类'
-                })
-
-            # 构建最终报告
-            report = {
-                'success': True,
-                'report_metadata': {
-                    'generated_at': datetime.utcnow().isoformat(),
-                    'user_preferences': user_preferences,
-                    'skin_concerns': skin_concerns,
-                    'budget_range': budget_range,
-                    'report_type': report_type
-                },
-                'statistics': statistics,
-                'top_recommendations': [
-                    {
-                        'rank': idx + 1,
-                        'product': {
-                            '序号': p['序号'],
-                            '平台': p['平台'],
-                            '名称': p['名称'],
-                            '价格': p['价格'],
-                            '推荐程度': p['推荐程度'],
-                            '用户评价数': p.get('用户评价数'),
-                            '用户购买数': p.get('用户购买数')
-                        },
-                        'relevance_score': round(p['relevance_score'], 4),
-                        'recommendation_reason': _generate_recommendation_reason(p, search_keywords)
-                    }
-                    for idx, p in enumerate(top_recommendations)
-                ],
-                'price_range_analysis': price_range_recommendations,
-                'effect_based_recommendations': effect_recommendations,
-                'platform_comparison': platform_analysis,
-                'smart_suggestions': smart_suggestions
-            }
-
-            return jsonify(report), 200
+                'report_type': report_type
+            },
+            'statistics': statistics,
+            'top_recommendations': [
+                {
+                    'rank': idx + 1,
+                    'product': {
+                        '序号': p['序号'],
+                        '平台': p['平台'],
+                        '名称': p['名称'],
+                        '价格': p['价格'],
+                        '推荐程度': p['推荐程度'],
+                        '用户评价数': p.get('用户评价数'),
+                        '用户购买数': p.get('用户购买数')
+                    },
+                    'relevance_score': round(p['relevance_score'], 4),
+                    'recommendation_reason': _generate_recommendation_reason(p, search_keywords)
+                }
+                for idx, p in enumerate(top_recommendations)
+            ],
+            'price_range_analysis': price_range_recommendations,
+            'effect_based_recommendations': effect_recommendations,
+            'platform_comparison': platform_analysis,
+            'smart_suggestions': smart_suggestions
+        }
 
-        finally:
-            session.close()
+        response = jsonify(report)
+        if cache_key is not None:
+            _report_cache.set(cache_key, response.get_data())
+            response.set_etag(cache_key)
+        return response, 200
 
     except Exception as e:
-        logger.error(f"Error generating skincare report: {e}", exc_info=True)
+        logger.error("Error generating skincare report: %s", e, exc_info=True)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 
+def _report_response(body, etag):
+    """JSON response from already serialised report bytes"""
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
 def _generate_recommendation_reason(product, keywords):
     """生成推荐理由"""
     reasons = []
@@ -472,7 +549,9 @@ def _generate_recommendation_reason(product, keywords):
     name = product['名称']
 
     # 检查关键词匹配
-    matched_keywords = [kw for kw in keywords.split() if kw in name]
+    keyword_list = keywords.split()
+    matched = get_keyword_matcher(tuple(keyword_list)).find(name)
+    matched_keywords = [kw for kw in keyword_list if kw in matched]
     if matched_keywords:
         reasons.append(f"包含您关注的功效: {', '.join(matched_keywords)}")
 
@@ -3,6 +3,8 @@ Products API Endpoints
 Handles product listing, details, and ingredient analysis
 """
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select, func, case, lambda_stmt
+from sqlalchemy.orm import joinedload
 from src.api.middleware.rate_limiter import rate_limit
 from src.config import SessionLocal
 from src.models import Product, ProductIngredient, Ingredient
@@ -49,32 +51,53 @@ def list_products():
         session = SessionLocal()
 
         try:
-            # Build query
-            query = session.query(Product).filter(Product.is_available == True)
+            # Build statements. Each criterion is a lambda so the compiled SQL is
+            # cached per combination of filters present, not per filter value.
+            criteria = [lambda s: s.where(Product.is_available == True)]
 
-            # Apply filters
             if category:
-                query = query.filter(Product.category == category)
+                criteria.append(lambda s: s.where(Product.category == category))
             if brand:
-                query = query.filter(Product.brand == brand)
+                criteria.append(lambda s: s.where(Product.brand == brand))
             if min_price is not None:
-                query = query.filter(Product.price >= min_price)
+                criteria.append(lambda s: s.where(Product.price >= min_price))
             if max_price is not None:
-                query = query.filter(Product.price <= max_price)
+                criteria.append(lambda s: s.where(Product.price <= max_price))
             if search:
-                query = query.filter(Product.name.ilike(f'%{search}%'))
+                search_pattern = f'%{search}%'
+                criteria.append(lambda s: s.where(Product.name.ilike(search_pattern)))
             if skin_type:
-                query = query.filter(Product.suitable_for_skin_types.contains(skin_type))
-
-            # Get total count
-            total = query.count()
+                criteria.append(
+                    lambda s: s.where(Product.suitable_for_skin_types.contains(skin_type))
+                )
+
+            # Page query carries the total via COUNT(*) OVER(), saving a separate count query.
+            # Plain column rows: the listing doesn't need ORM objects
+            query_stmt = lambda_stmt(
+                lambda: Product.to_dict_query().add_columns(func.count().over().label('total'))
+            )
+            for criterion in criteria:
+                query_stmt += criterion
 
             # Apply pagination
             offset = (page - 1) * per_page
-            products = query.offset(offset).limit(per_page).all()
+            query_stmt += lambda s: s.order_by(Product.product_id).offset(offset).limit(per_page)
+            rows = session.execute(query_stmt).all()
+
+            # Get total count
+            if rows:
+                total = rows[0].total
+            elif offset > 0:
+                # Past the last page there is no row to carry the total
+                count_stmt = lambda_stmt(lambda: select(func.count(Product.product_id)))
+                for criterion in criteria:
+                    count_stmt += criterion
+                total = session.execute(count_stmt).scalar()
+            else:
+                total = 0
 
             # Convert to dict
-            products_list = [p.to_dict() for p in products]
+            products_list = [Product.row_to_dict(row) for row in rows]
 
             return jsonify({
                 'success': True,
@@ -89,7 +112,7 @@ def list_products():
             session.close()
 
     except Exception as e:
-        logger.error(f"Error listing products: {e}", exc_info=True)
+        logger.error("Error listing products: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -131,7 +154,7 @@ def get_product_details(product_id):
     except NotFoundError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
-        logger.error(f"Error getting product details: {e}", exc_info=True)
+        logger.error("Error getting product details: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -141,44 +164,60 @@ def get_product_ingredients(product_id):
     """
     Get ingredient analysis for a product
 
+    Query Parameters:
+        include_ingredients (bool): Include the full ingredient list (default: true).
+            Pass 0/false to get only the safety summary.
+
     Returns:
         JSON response with ingredients and safety analysis
     """
     try:
+        include_ingredients = (
+            request.args.get('include_ingredients', '1').lower() not in ('0', 'false', 'no')
+        )
+
         session = SessionLocal()
 
         try:
-            # Check product exists
-            product = session.query(Product).filter(Product.product_id == product_id).first()
+            # Check product exists (served from the identity map when already loaded)
+            product = session.get(Product, product_id)
             if not product:
                 raise NotFoundError(f"Product {product_id} not found")
 
-            # Get product ingredients
-            product_ingredients = session.query(ProductIngredient, Ingredient).join(
-                Ingredient, ProductIngredient.ingredient_id == Ingredient.ingredient_id
-            ).filter(
-                ProductIngredient.product_id == product_id
-            ).order_by(ProductIngredient.position).all()
-
-            # Build ingredients list
+            # Safety aggregates computed in the database.
+            # Missing ratings count towards the ingredient total but add nothing to the sum.
+            ingredient_count, total_safety_score, allergen_count = session.execute(
+                select(
+                    func.count(ProductIngredient.id),
+                    func.coalesce(func.sum(Ingredient.safety_rating), 0),
+                    func.coalesce(
+                        func.sum(case((Ingredient.is_common_allergen == True, 1), else_=0)), 0
+                    ),
+                )
+                .join(Ingredient, ProductIngredient.ingredient_id == Ingredient.ingredient_id)
+                .where(ProductIngredient.product_id == product_id)
+            ).one()
+
+            # Get product ingredients, ingredient rows eager-loaded in the same query
             ingredients_list = []
-            total_safety_score = 0
-            allergen_count = 0
-
-            for pi, ingredient in product_ingredients:
-                ingredient_dict = ingredient.to_dict()
-                ingredient_dict['position'] = pi.position
-                ingredient_dict['concentration'] = float(pi.concentration) if pi.concentration else None
-
-                ingredients_list.append(ingredient_dict)
-
-                if ingredient.safety_rating:
-                    total_safety_score += ingredient.safety_rating
-                if ingredient.is_common_allergen:
-                    allergen_count += 1
+            if include_ingredients and ingredient_count:
+                product_ingredients = session.execute(
+                    select(ProductIngredient)
+                    .options(joinedload(ProductIngredient.ingredient))
+                    .where(ProductIngredient.product_id == product_id)
+                    .order_by(ProductIngredient.position)
+                ).scalars().all()
+
+                for pi in product_ingredients:
+                    ingredient_dict = pi.ingredient.to_dict()
+                    ingredient_dict['position'] = pi.position
+                    ingredient_dict['concentration'] = pi.concentration
+                    ingredients_list.append(ingredient_dict)
 
             # Calculate overall safety
-            avg_safety_rating = total_safety_score / len(ingredients_list) if ingredients_list else 0
+            avg_safety_rating = (
+                float(total_safety_score) / ingredient_count if ingredient_count else 0
+            )
 
             # Safety assessment
             if avg_safety_rating <= 3:
@@ -192,12 +231,12 @@ def get_product_ingredients(product_id):
                 'success': True,
                 'product_id': product_id,
                 'product_name': product.name,
-                'ingredient_count': len(ingredients_list),
+                'ingredient_count': ingredient_count,
                 'ingredients': ingredients_list,
                 'safety_analysis': {
                     'average_safety_rating': round(avg_safety_rating, 2),
                     'safety_level': safety_level,
-                    'allergen_count': allergen_count,
+                    'allergen_count': int(allergen_count),
                     'has_allergens': allergen_count > 0,
                 }
             }), 200
@@ -208,5 +247,5 @@ def get_product_ingredients(product_id):
     except NotFoundError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
-        logger.error(f"Error getting product ingredients: {e}", exc_info=True)
+        logger.error("Error getting product ingredients: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
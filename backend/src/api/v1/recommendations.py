@@ -53,7 +53,7 @@ def get_recommendations():
         if max_price is not None:
             filters['max_price'] = max_price
 
-        logger.info(f"Generating recommendations for user {user_id}, n={n}, filters={filters}")
+        logger.info("Generating recommendations for user %s, n=%s, filters=%s", user_id, n, filters)
 
         # Generate recommendations
         recommendations = recommendation_service.generate_recommendations(
@@ -73,7 +73,7 @@ def get_recommendations():
     except ValidationError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error generating recommendations: {e}", exc_info=True)
+        logger.error("Error generating recommendations: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -114,7 +114,7 @@ def submit_feedback():
         if not success:
             raise NotFoundError("Recommendation not found")
 
-        logger.info(f"Recorded feedback '{feedback}' for recommendation {recommendation_id}")
+        logger.info("Recorded feedback '%s' for recommendation %s", feedback, recommendation_id)
 
         return jsonify({
             'success': True,
@@ -126,5 +126,5 @@ def submit_feedback():
     except NotFoundError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
-        logger.error(f"Error recording feedback: {e}", exc_info=True)
+        logger.error("Error recording feedback: %s", e, exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
@@ -3,19 +3,91 @@ Skincare Products API
 护肤品数据API端点
 """
 from flask import Blueprint, request, jsonify
-from sqlalchemy import func, desc
+from sqlalchemy import select, func, desc, lambda_stmt
 from src.config import SessionLocal
-import sys
-import os
-
-# Add the scripts directory to Python path to import the model
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../../scripts'))
-from parse_skincare_data import SkincareProduct
+from src.models.skincare_product import SkincareProduct
+from src.utils.cache import cached
 
 skincare_bp = Blueprint('skincare', __name__)
 
+# 价格分布区间（左闭右开）
+PRICE_RANGES = [
+    (0, 50, '0-50元'),
+    (50, 100, '50-100元'),
+    (100, 200, '100-200元'),
+    (200, 500, '200-500元'),
+    (500, 1000, '500-1000元'),
+    (1000, 10000, '1000元以上')
+]
+
+# 列表接口返回的列
+_LIST_COLUMNS = (
+    SkincareProduct.序号, SkincareProduct.平台, SkincareProduct.名称, SkincareProduct.价格,
+    SkincareProduct.用户评价数, SkincareProduct.用户购买数, SkincareProduct.推荐程度,
+    SkincareProduct.页数, SkincareProduct.页内序号
+)
+
+# 搜索结果 / Top 推荐返回的列
+_SUMMARY_COLUMNS = (
+    SkincareProduct.序号, SkincareProduct.平台, SkincareProduct.名称, SkincareProduct.价格,
+    SkincareProduct.推荐程度
+)
+
+
+# 分析接口的统计查询不带参数，模块加载时构建一次
+# 总体统计、价格统计、价格分布：一次扫描的条件聚合
+_ANALYTICS_STATS = select(
+    func.count(SkincareProduct.序号),
+    func.count(SkincareProduct.序号).filter(SkincareProduct.平台 == 'JD'),
+    func.count(SkincareProduct.序号).filter(SkincareProduct.平台 == 'TB'),
+    func.avg(SkincareProduct.价格),
+    func.max(SkincareProduct.价格),
+    func.min(SkincareProduct.价格).filter(SkincareProduct.价格 > 0),
+    *[
+        func.count(SkincareProduct.序号).filter(
+            SkincareProduct.价格 >= min_p, SkincareProduct.价格 < max_p
+        )
+        for min_p, max_p, _ in PRICE_RANGES
+    ]
+)
+
+# Top 10 推荐商品
+_TOP_PRODUCTS = select(*_SUMMARY_COLUMNS).order_by(SkincareProduct.序号).limit(10)
+
+
+def _fetch_page(session, columns_stmt, criteria, page, per_page):
+    """
+    查询一页数据及总数
+
+    columns_stmt 是返回 select(...) 的 lambda，criteria 是依次应用的 lambda 条件（筛选、排序），
+    用 lambda_stmt 组合后，SQL 按条件组合缓存，每次请求只绑定参数。
+    COUNT(*) OVER() 把总数附加在每一行上（total 列），一次查询代替 count() + 分页查询
+    """
+    offset = (page - 1) * per_page
+
+    stmt = lambda_stmt(columns_stmt)
+    stmt += lambda s: s.add_columns(func.count().over().label('total'))
+    for criterion in criteria:
+        stmt += criterion
+    stmt += lambda s: s.offset(offset).limit(per_page)
+    rows = session.execute(stmt).all()
+
+    if rows:
+        return rows, rows[0].total
+
+    if offset == 0:
+        return rows, 0
+
+    # 页码超出范围时没有行携带总数，单独计数
+    count_stmt = lambda_stmt(columns_stmt)
+    for criterion in criteria:
+        count_stmt += criterion
+    count_stmt += lambda s: select(func.count()).select_from(s.order_by(None).subquery())
+    return rows, session.execute(count_stmt).scalar()
+
 
 @skincare_bp.route('/skincare/products', methods=['GET'])
+@cached('skincare', ttl=120)
 def get_skincare_products():
     """
     获取护肤品列表
@@ -33,27 +105,25 @@ def get_skincare_products():
         per_page = min(request.args.get('per_page', 20, type=int), 100)
         sort_by = request.args.get('sort_by', 'recommendation', type=str)
 
-        # 构建查询
-        query = session.query(SkincareProduct)
+        # 构建查询条件（只查询需要的列，不构建ORM对象）
+        criteria = []
 
         # 平台筛选
         if platform and platform in ['JD', 'TB']:
-            query = query.filter(SkincareProduct.平台 == platform)
+            criteria.append(lambda s: s.where(SkincareProduct.平台 == platform))
 
         # 排序
         if sort_by == 'price':
-            query = query.order_by(desc(SkincareProduct.价格))
+            criteria.append(lambda s: s.order_by(desc(SkincareProduct.价格)))
         elif sort_by == 'recommendation':
-            query = query.order_by(SkincareProduct.序号)  # 序号小 = 推荐度高
+            criteria.append(lambda s: s.order_by(SkincareProduct.序号))  # 序号小 = 推荐度高
 
-        # 分页
-        total = query.count()
-        offset = (page - 1) * per_page
-        products = query.offset(offset).limit(per_page).all()
+        # 分页（总数随当前页一起返回）
+        rows, total = _fetch_page(session, lambda: select(*_LIST_COLUMNS), criteria, page, per_page)
 
         # 转换为字典
         products_data = []
-        for p in products:
+        for p in rows:
             products_data.append({
                 '序号': p.序号,
                 '平台': p.平台,
@@ -84,35 +154,22 @@ def get_skincare_products():
 
 
 @skincare_bp.route('/skincare/analytics', methods=['GET'])
+@cached('skincare', ttl=120)
 def get_skincare_analytics():
     """获取护肤品数据分析"""
     session = SessionLocal()
     try:
-        # 总体统计
-        total_count = session.query(func.count(SkincareProduct.序号)).scalar()
-        jd_count = session.query(func.count(SkincareProduct.序号)).filter(
-            SkincareProduct.平台 == 'JD'
-        ).scalar()
-        tb_count = session.query(func.count(SkincareProduct.序号)).filter(
-            SkincareProduct.平台 == 'TB'
-        ).scalar()
-
-        # 价格统计
-        avg_price = session.query(func.avg(SkincareProduct.价格)).filter(
-            SkincareProduct.价格.isnot(None)
-        ).scalar()
-        max_price = session.query(func.max(SkincareProduct.价格)).filter(
-            SkincareProduct.价格.isnot(None)
-        ).scalar()
-        min_price = session.query(func.min(SkincareProduct.价格)).filter(
-            SkincareProduct.价格.isnot(None),
-            SkincareProduct.价格 > 0
-        ).scalar()
+        # 总体统计、价格统计、价格分布
+        stats = session.execute(_ANALYTICS_STATS).one()
+
+        total_count, jd_count, tb_count, avg_price, max_price, min_price = stats[:6]
+        price_distribution = [
+            {'range': label, 'count': count}
+            for (_, _, label), count in zip(PRICE_RANGES, stats[6:])
+        ]
 
         # Top 10 推荐商品
-        top_products = session.query(SkincareProduct).order_by(
-            SkincareProduct.序号
-        ).limit(10).all()
+        top_products = session.execute(_TOP_PRODUCTS).all()
 
         top_products_data = []
         for p in top_products:
@@ -124,27 +181,6 @@ def get_skincare_analytics():
                 '推荐程度': float(p.推荐程度) if p.推荐程度 else None
             })
 
-        # 价格分布
-        price_ranges = [
-            (0, 50, '0-50元'),
-            (50, 100, '50-100元'),
-            (100, 200, '100-200元'),
-            (200, 500, '200-500元'),
-            (500, 1000, '500-1000元'),
-            (1000, 10000, '1000元以上')
-        ]
-
-        price_distribution = []
-        for min_p, max_p, label in price_ranges:
-            count = session.query(func.count(SkincareProduct.序号)).filter(
-                SkincareProduct.价格 >= min_p,
-                SkincareProduct.价格 < max_p
-            ).scalar()
-            price_distribution.append({
-                'range': label,
-                'count': count
-            })
-
         return jsonify({
             'success': True,
             'analytics': {
@@ -177,17 +213,19 @@ def search_skincare_products():
         if not keyword:
             return jsonify({'success': False, 'error': '请提供搜索关键词'}), 400
 
-        # 搜索
-        query = session.query(SkincareProduct).filter(
-            SkincareProduct.名称.like(f'%{keyword}%')
-        ).order_by(SkincareProduct.序号)
+        # 搜索（PostgreSQL 上由 名称 的 pg_trgm GIN 索引支持）
+        pattern = f'%{keyword}%'
+        criteria = [
+            lambda s: s.where(SkincareProduct.名称.like(pattern)),
+            lambda s: s.order_by(SkincareProduct.序号),
+        ]
 
-        total = query.count()
-        offset = (page - 1) * per_page
-        products = query.offset(offset).limit(per_page).all()
+        rows, total = _fetch_page(
+            session, lambda: select(*_SUMMARY_COLUMNS), criteria, page, per_page
+        )
 
         products_data = []
-        for p in products:
+        for p in rows:
             products_data.append({
                 '序号': p.序号,
                 '平台': p.平台,
@@ -1,29 +1,80 @@
 """
 护肤品ML推荐API
-使用训练好的TF-IDF和K-NN模型提供智能推荐
+使用训练好的TF-IDF模型提供智能推荐
 """
 from flask import Blueprint, request, jsonify
 import pickle
 import os
-import sys
+from functools import lru_cache
 import jieba
+import joblib
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from src.services.skincare_catalog import SkincareCatalog, PLATFORM_CODES, get_skincare_catalog
+from src.services.skincare_features import extract_name_features
+from src.utils.cache import cached
+from src.utils.ranking import top_k_indices, top_k_neighbors
 
 skincare_ml_bp = Blueprint('skincare_ml', __name__)
 
+# 相似商品表每个商品保存的邻居数（/similar 最多返回50个）
+SIMILAR_TOP_K = 50
+
 # 全局变量存储模型
 _model_cache = {
     'tfidf_vectorizer': None,
     'tfidf_matrix': None,
-    'knn_model': None,
-    'products_data': None
+    'products_data': None,
+    'id_to_idx': None,
+    'catalog': None,
+    'feature_scores': None,
+    'tfidf_matrix_csc': None,
+    'similar_indices': None,
+    'similar_scores': None
 }
 
 
+def _load_estimator(model_dir, name):
+    """
+    加载sklearn对象：优先 joblib 文件（numpy数组以只读内存映射打开，多进程共享页缓存），
+    否则回退到旧版 pickle 文件
+    """
+    path = f'{model_dir}/{name}.joblib'
+    if os.path.exists(path):
+        return joblib.load(path, mmap_mode='r')
+
+    with open(f'{model_dir}/{name}.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+def _load_tfidf_matrix(model_dir):
+    """加载TF-IDF矩阵：优先 .npz，否则回退到旧版 pickle 文件"""
+    path = f'{model_dir}/tfidf_matrix.npz'
+    if os.path.exists(path):
+        return sp.load_npz(path)
+
+    with open(f'{model_dir}/tfidf_matrix.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+def _load_similar_table(model_dir, tfidf_matrix):
+    """
+    加载训练时预计算的相似商品表（只读内存映射）
+    文件不存在或与矩阵不匹配时，根据TF-IDF矩阵现场计算
+    """
+    indices_path = f'{model_dir}/similar_indices.npy'
+    scores_path = f'{model_dir}/similar_scores.npy'
+
+    if os.path.exists(indices_path) and os.path.exists(scores_path):
+        indices = np.load(indices_path, mmap_mode='r')
+        scores = np.load(scores_path, mmap_mode='r')
+        if indices.shape == scores.shape == (tfidf_matrix.shape[0], SIMILAR_TOP_K):
+            return indices, scores
+
+    return top_k_neighbors(tfidf_matrix, SIMILAR_TOP_K)
+
+
 def load_models():
     """加载ML模型（懒加载）"""
     if _model_cache['tfidf_vectorizer'] is not None:
@@ -34,21 +85,38 @@ def load_models():
 
     try:
         # 加载TF-IDF向量化器
-        with open(f'{model_dir}/tfidf_vectorizer.pkl', 'rb') as f:
-            _model_cache['tfidf_vectorizer'] = pickle.load(f)
+        _model_cache['tfidf_vectorizer'] = _load_estimator(model_dir, 'tfidf_vectorizer')
+
+        # 加载TF-IDF矩阵（CSR，行预先L2归一化，余弦相似度 = 稀疏矩阵乘向量）
+        tfidf_matrix = normalize(_load_tfidf_matrix(model_dir).tocsr(), norm='l2', copy=False)
+
+        # 特征平均权重（模型信息用），在降精度之前计算
+        _model_cache['feature_scores'] = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
+
+        # float32 存储：相似度计算是内存带宽瓶颈，数据量减半
+        _model_cache['tfidf_matrix'] = tfidf_matrix.astype(np.float32)
 
-        # 加载TF-IDF矩阵
-        with open(f'{model_dir}/tfidf_matrix.pkl', 'rb') as f:
-            _model_cache['tfidf_matrix'] = pickle.load(f)
+        # 按列存储的副本：偏好向量只有少数非零特征，只需读取这些列
+        _model_cache['tfidf_matrix_csc'] = _model_cache['tfidf_matrix'].tocsc()
 
-        # 加载K-NN模型
-        with open(f'{model_dir}/knn_model.pkl', 'rb') as f:
-            _model_cache['knn_model'] = pickle.load(f)
+        # 每个商品的Top K相似商品（行索引、相似度）
+        _model_cache['similar_indices'], _model_cache['similar_scores'] = _load_similar_table(
+            model_dir, _model_cache['tfidf_matrix']
+        )
 
         # 加载商品数据
         with open(f'{model_dir}/products_data.pkl', 'rb') as f:
             _model_cache['products_data'] = pickle.load(f)
 
+        # 序号 -> 行索引（序号重复时取第一个）
+        id_to_idx = {}
+        for i, p in enumerate(_model_cache['products_data']):
+            id_to_idx.setdefault(p['序号'], i)
+        _model_cache['id_to_idx'] = id_to_idx
+
+        # 价格/平台/推荐程度列（与 tfidf_matrix 行对齐），用于向量化筛选
+        _model_cache['catalog'] = SkincareCatalog(_model_cache['products_data'])
+
         print(f"✅ ML模型加载成功 ({len(_model_cache['products_data'])} 个商品)")
 
     except Exception as e:
@@ -58,67 +126,50 @@ def load_models():
     return _model_cache
 
 
+def preload_models():
+    """
+    启动时预加载：ML模型、jieba词典、商品目录
+    避免第一个请求承担加载开销
+    """
+    load_models()
+    jieba.initialize()
+    get_skincare_catalog()
+
+
+@lru_cache(maxsize=4096)
 def extract_features_from_name(name):
-    """从商品名称中提取特征（与训练时相同）"""
-    features = []
-
-    # 1. 提取品牌关键词
-    brands = [
-        '欧莱雅', '谷雨', '海蓝之谜', 'LA MER', '妮维雅', 'NIVEA',
-        '科颜氏', "Kiehl's", '自然堂', '兰蔻', '雅诗兰黛', '资生堂',
-        '欧诗漫', '百雀羚', '大宝', '韩束', '珀莱雅', '袋鼠妈妈',
-        '青蛙王子', '隆力奇', '蜜沐聆'
-    ]
-    for brand in brands:
-        if brand in name:
-            features.append(f'品牌_{brand}')
-
-    # 2. 提取功效关键词
-    effects = [
-        '美白', '保湿', '补水', '抗皱', '紧致', '淡斑', '祛斑',
-        '修护', '滋润', '提亮', '去黄', '抗氧化', '淡纹', '控油',
-        '舒缓', '提拉', '焕肤', '嫩肤', '御龄'
-    ]
-    for effect in effects:
-        if effect in name:
-            features.append(f'功效_{effect}')
-
-    # 3. 提取产品类型
-    product_types = [
-        '面霜', '乳液', '精华', '水乳', '套装', '礼盒', '洁面',
-        '爽肤水', '晚霜', '日霜', '眼霜', '护手霜', '身体乳',
-        '面膜', '精萃水', '凝露', '凝胶'
-    ]
-    for ptype in product_types:
-        if ptype in name:
-            features.append(f'类型_{ptype}')
-
-    # 4. 提取适用人群
-    targets = [
-        '男士', '女', '孕妇', '儿童', '宝宝', '婴儿', '准孕妇'
-    ]
-    for target in targets:
-        if target in name:
-            features.append(f'人群_{target}')
-
-    # 5. 提取规格相关
-    specs = ['套装', '礼盒', '旅行装', '小样', '正装']
-    for spec in specs:
-        if spec in name:
-            features.append(f'规格_{spec}')
-
-    # 6. 使用jieba分词提取其他关键词
-    words = jieba.cut(name)
-    meaningful_words = [w for w in words if len(w) >= 2 and w not in ['的', '和', '与', '或']]
-    features.extend(meaningful_words[:5])
-
-    return ' '.join(features) if features else name
+    """
+    从商品名称中提取特征（与训练时相同）
+    结果只取决于输入文本，按文本缓存，重复的偏好查询不再分词
+    """
+    return extract_name_features(name)
+
+
+def _cosine_similarities(models, vector):
+    """
+    已L2归一化的稀疏行向量与所有商品的余弦相似度（矩阵行已归一化）
+    只累加向量非零特征对应的列，计算量与这些列的非零元素数成正比
+    """
+    vector = vector.tocsr()
+    columns = vector.indices
+    similarities = np.zeros(models['tfidf_matrix_csc'].shape[0], dtype=np.float64)
+
+    if len(columns):
+        weights = vector.data.astype(np.float32)
+        similarities += models['tfidf_matrix_csc'][:, columns] @ weights
+
+    return similarities
+
+
+def _preference_similarities(models, preference_vector):
+    """偏好向量与所有商品的余弦相似度"""
+    return _cosine_similarities(models, normalize(preference_vector, norm='l2', copy=False))
 
 
 @skincare_ml_bp.route('/skincare/ml/similar/<int:product_id>', methods=['GET'])
 def get_similar_products(product_id):
     """
-    获取相似商品推荐（基于K-NN）
+    获取相似商品推荐（余弦相似度最近邻）
 
     参数:
         product_id: 商品序号
@@ -130,11 +181,7 @@ def get_similar_products(product_id):
         n_recommendations = min(n_recommendations, 50)  # 最多50个
 
         # 查找商品索引
-        product_idx = None
-        for idx, product in enumerate(models['products_data']):
-            if product['序号'] == product_id:
-                product_idx = idx
-                break
+        product_idx = models['id_to_idx'].get(product_id)
 
         if product_idx is None:
             return jsonify({
@@ -142,16 +189,15 @@ def get_similar_products(product_id):
                 'error': f'商品ID {product_id} 不存在'
             }), 404
 
-        # 使用K-NN找相似商品
-        distances, indices = models['knn_model'].kneighbors(
-            models['tfidf_matrix'][product_idx],
-            n_neighbors=n_recommendations + 1
-        )
+        # 查预计算的相似商品表（已排除自己，按相似度降序）
+        neighbors = models['similar_indices'][product_idx, :n_recommendations]
+        scores = models['similar_scores'][product_idx, :n_recommendations]
 
-        # 构建推荐列表（排除自己）
+        # 构建推荐列表
         recommendations = []
-        for i, (dist, idx) in enumerate(zip(distances[0][1:], indices[0][1:])):
-            similarity = 1 - dist
+        for i, (idx, similarity) in enumerate(zip(neighbors, scores)):
+            if idx < 0:
+                break
             product = models['products_data'][idx]
             recommendations.append({
                 'rank': i + 1,
@@ -180,7 +226,7 @@ def get_similar_products(product_id):
                 '推荐程度': base_product['推荐程度']
             },
             'recommendations': recommendations,
-            'algorithm': 'K-NN with cosine similarity',
+            'algorithm': 'cosine similarity (precomputed top-K)',
             'total': len(recommendations)
         })
 
@@ -226,50 +272,44 @@ def recommend_by_preferences():
         preference_vector = models['tfidf_vectorizer'].transform([preference_features])
 
         # 计算与所有商品的相似度
-        similarities = cosine_similarity(preference_vector, models['tfidf_matrix'])[0]
-
-        # 结合推荐程度进行加权，并应用筛选条件
-        candidates = []
-        for i, sim in enumerate(similarities):
-            product = models['products_data'][i]
-
-            # 价格筛选
-            if product['价格'] < min_price or product['价格'] > max_price:
-                continue
-
-            # 平台筛选
-            if platform != 'all' and product['平台'] != platform:
-                continue
-
-            recommendation_score = product['推荐程度']
-            # 加权: 70%相似度 + 30%平台推荐度
-            weighted_score = 0.7 * sim + 0.3 * recommendation_score
-
-            candidates.append({
-                'index': i,
-                'similarity': float(sim),
-                'weighted_score': float(weighted_score),
-                'product': product
-            })
-
-        # 按加权分数排序
-        candidates.sort(key=lambda x: x['weighted_score'], reverse=True)
+        similarities = _preference_similarities(models, preference_vector)
+
+        # 价格、平台筛选
+        catalog = models['catalog']
+        mask = (catalog.price >= min_price) & (catalog.price <= max_price)
+        if platform != 'all':
+            platform_code = PLATFORM_CODES.get(platform)
+            if platform_code is None:
+                mask[:] = False
+            else:
+                mask &= catalog.platform == platform_code
+        candidates = np.flatnonzero(mask)
+
+        # 加权: 70%相似度 + 30%平台推荐度（原地计算，不产生中间数组）
+        weighted_scores = similarities[candidates]
+        weighted_scores *= 0.7
+        weighted_scores += 0.3 * catalog.rec[candidates]
+
+        # 只对前N名排序
+        top = top_k_indices(weighted_scores, n_recommendations)
 
         # 返回Top N
         recommendations = []
-        for i, candidate in enumerate(candidates[:n_recommendations]):
+        for rank, i in enumerate(top):
+            idx = candidates[i]
+            product = models['products_data'][idx]
             recommendations.append({
-                'rank': i + 1,
-                'similarity': candidate['similarity'],
-                'weighted_score': candidate['weighted_score'],
+                'rank': rank + 1,
+                'similarity': float(similarities[idx]),
+                'weighted_score': float(weighted_scores[i]),
                 'product': {
-                    '序号': candidate['product']['序号'],
-                    '平台': candidate['product']['平台'],
-                    '名称': candidate['product']['名称'],
-                    '价格': candidate['product']['价格'],
-                    '推荐程度': candidate['product']['推荐程度'],
-                    '用户评价数': candidate['product']['用户评价数'],
-                    '用户购买数': candidate['product']['用户购买数']
+                    '序号': product['序号'],
+                    '平台': product['平台'],
+                    '名称': product['名称'],
+                    '价格': product['价格'],
+                    '推荐程度': product['推荐程度'],
+                    '用户评价数': product['用户评价数'],
+                    '用户购买数': product['用户购买数']
                 }
             })
 
@@ -295,6 +335,7 @@ def recommend_by_preferences():
 
 
 @skincare_ml_bp.route('/skincare/ml/model_info', methods=['GET'])
+@cached('skincare-ml', ttl=300)
 def get_model_info():
     """获取ML模型信息"""
     try:
@@ -302,7 +343,7 @@ def get_model_info():
 
         # 获取特征信息
         feature_names = models['tfidf_vectorizer'].get_feature_names_out()
-        feature_scores = np.asarray(models['tfidf_matrix'].mean(axis=0)).ravel()
+        feature_scores = models['feature_scores']
         top_indices = feature_scores.argsort()[-20:][::-1]
 
         top_features = []
@@ -317,8 +358,8 @@ def get_model_info():
             'model_info': {
                 'total_products': len(models['products_data']),
                 'tfidf_features': models['tfidf_matrix'].shape[1],
-                'knn_neighbors': 10,
-                'algorithm': 'K-NN with cosine similarity',
+                'knn_neighbors': SIMILAR_TOP_K,
+                'algorithm': 'cosine similarity (precomputed top-K)',
                 'top_features': top_features
             }
         })
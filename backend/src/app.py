@@ -2,13 +2,17 @@
 Main Flask Application
 Entry point for the Cosmetics Recommendation System backend
 """
+import logging
 from flask import Flask, jsonify
-from src.config import config
+from src.config import config, db_session
 from src.utils.logger import setup_logging
 from src.utils.errors import register_error_handlers
+from src.utils.json_provider import ORJSONProvider
 from src.api.middleware.cors import init_cors
 from src.api.v1 import init_api_routes
 
+logger = logging.getLogger(__name__)
+
 
 def create_app():
     """
@@ -20,6 +24,9 @@ def create_app():
     # Load configuration
     app.config.from_object(config)
 
+    # Serialise JSON responses with orjson
+    app.json = ORJSONProvider(app)
+
     # Setup logging
     setup_logging(app)
 
@@ -32,6 +39,20 @@ def create_app():
     # Register API routes
     init_api_routes(app)
 
+    # Close the request's shared database session (returns its connection to the pool)
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        db_session.remove()
+
+    # Warm up ML models so the first request doesn't pay the load cost
+    if app.config.get('PRELOAD_ML_MODELS'):
+        try:
+            from src.api.v1.skincare_ml import preload_models
+            preload_models()
+        except Exception as e:
+            # Endpoints still load lazily (and report errors) if this fails
+            logger.warning("ML model preload failed: %s", e)
+
     # Health check endpoint
     @app.route('/api/v1/health', methods=['GET'])
     def health_check():
@@ -12,9 +12,9 @@ from src.models.product_ingredient import ProductIngredient
 from src.models.recommendation import Recommendation
 from src.models.user_rating import UserRating
 from src.models.user_interaction import UserInteraction
-
-# Import DimDate from seed script
-from scripts.seed_dim_date import DimDate
+from src.models.item_similarity import ItemSimilarity
+from src.models.dim_date import DimDate
+from src.models.skincare_product import SkincareProduct
 
 __all__ = [
     'BaseModel',
@@ -27,5 +27,7 @@ __all__ = [
     'Recommendation',
     'UserRating',
     'UserInteraction',
+    'ItemSimilarity',
     'DimDate',
+    'SkincareProduct',
 ]
@@ -3,9 +3,68 @@ Base SQLAlchemy Model
 Provides common fields and methods for all models
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Integer, DateTime, Index, DDL, Numeric, event, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
 from src.config import Base
 
+# Trigram indexes need the pg_trgm extension; create it before any table
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+
+def trigram_index(name, column):
+    """
+    GIN trigram index so substring filters (LIKE/ILIKE '%term%') on the
+    column can use an index on PostgreSQL. Skipped on other dialects.
+    """
+    return Index(
+        name,
+        column,
+        postgresql_using='gin',
+        postgresql_ops={column: 'gin_trgm_ops'},
+    ).ddl_if(dialect='postgresql')
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time, evaluated by the database (transaction start time)
+
+    Usable as server_default, or as a value shared by all rows of a
+    bulk_insert so it is not sent as a parameter with every row.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+class FloatNumeric(TypeDecorator):
+    """
+    NUMERIC column that reads back as float instead of Decimal
+
+    The conversion happens once in SQLAlchemy's result processing, so
+    to_dict() and the API can use the values as they are.
+    """
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, precision=None, scale=None):
+        super().__init__(precision=precision, scale=scale, asdecimal=False)
+
 
 class BaseModel(Base):
     """
@@ -18,6 +77,23 @@ class BaseModel(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    @classmethod
+    def bulk_insert(cls, session, rows, **values):
+        """
+        Insert many rows in one executemany INSERT (no ORM objects are built)
+
+        Column defaults (created_at, updated_at, ...) are still applied. The
+        caller commits.
+
+        Args:
+            session: Database session
+            rows: List of column-name -> value dictionaries
+            values: Columns with the same SQL expression in every row (e.g.
+                    recommended_at=utcnow()), rendered into the statement
+        """
+        if rows:
+            session.execute(insert(cls).values(**values), rows)
+
     def to_dict(self):
         """Convert model instance to dictionary"""
         return {
@@ -0,0 +1,23 @@
+"""
+DimDate Model
+Date dimension table for the data warehouse
+"""
+from sqlalchemy import Column, Integer, String, Date
+from src.config import Base
+
+
+class DimDate(Base):
+    """Date Dimension Table"""
+    __tablename__ = 'dim_date'
+
+    date_id = Column(Integer, primary_key=True)  # Format: YYYYMMDD
+    date = Column(Date, nullable=False, unique=True)
+    year = Column(Integer, nullable=False)
+    quarter = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    week = Column(Integer, nullable=False)
+    day_of_month = Column(Integer, nullable=False)
+    day_of_week = Column(Integer, nullable=False)  # 0=Monday, 6=Sunday
+    day_name = Column(String(10), nullable=False)
+    month_name = Column(String(10), nullable=False)
+    is_weekend = Column(Integer, nullable=False)  # 0=No, 1=Yes
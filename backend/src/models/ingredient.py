@@ -4,7 +4,7 @@ Represents cosmetic ingredients and their properties
 """
 from sqlalchemy import Column, Integer, String, Text, Boolean
 from sqlalchemy.orm import relationship
-from src.models.base import BaseModel
+from src.models.base import BaseModel, trigram_index
 
 
 class Ingredient(BaseModel):
@@ -12,6 +12,10 @@ class Ingredient(BaseModel):
     Cosmetic ingredient model with safety information
     """
     __tablename__ = 'dim_ingredient'
+    __table_args__ = (
+        # Substring search on ingredient names
+        trigram_index('idx_ingredients_name_trgm', 'name'),
+    )
 
     ingredient_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), unique=True, nullable=False, index=True)
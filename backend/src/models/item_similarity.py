@@ -0,0 +1,40 @@
+"""
+ItemSimilarity Model
+Precomputed item-item similarities from the collaborative filtering model
+"""
+from sqlalchemy import Column, Integer, ForeignKey
+from src.models.base import BaseModel, FloatNumeric
+
+
+class ItemSimilarity(BaseModel):
+    """
+    Top-K most similar products of each product (adjusted cosine)
+    Rewritten as a whole each time the recommendation models are trained
+    """
+    __tablename__ = 'item_similarity'
+
+    # The primary key (product_id, similar_product_id) also serves
+    # "similar products of X" lookups
+    product_id = Column(
+        Integer, ForeignKey('dim_product.product_id', ondelete='CASCADE'), primary_key=True
+    )
+    similar_product_id = Column(
+        Integer, ForeignKey('dim_product.product_id', ondelete='CASCADE'), primary_key=True
+    )
+
+    similarity = Column(FloatNumeric(5, 4), nullable=False)  # -1.0000 to 1.0000
+    rank = Column(Integer, nullable=False)  # 1 = most similar
+
+    def __repr__(self):
+        return (
+            f"<ItemSimilarity(product={self.product_id}, similar={self.similar_product_id}, "
+            f"similarity={self.similarity})>"
+        )
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'similar_product_id': self.similar_product_id,
+            'similarity': self.similarity,
+            'rank': self.rank,
+        }
@@ -2,9 +2,9 @@
 Product Model
 Represents cosmetic products in the system
 """
-from sqlalchemy import Column, Integer, String, Numeric, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Text, Enum, Boolean, select
 from sqlalchemy.orm import relationship
-from src.models.base import BaseModel
+from src.models.base import BaseModel, FloatNumeric, trigram_index
 
 
 class Product(BaseModel):
@@ -12,6 +12,11 @@ class Product(BaseModel):
     Cosmetic product model
     """
     __tablename__ = 'dim_product'
+    __table_args__ = (
+        # Substring search on name/brand (ilike '%term%')
+        trigram_index('idx_products_name_trgm', 'name'),
+        trigram_index('idx_products_brand_trgm', 'brand'),
+    )
 
     product_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), nullable=False, index=True)
@@ -27,7 +32,7 @@ class Product(BaseModel):
     subcategory = Column(String(100), nullable=True)
 
     # Pricing
-    price = Column(Numeric(10, 2), nullable=True)
+    price = Column(FloatNumeric(10, 2), nullable=True)
     currency = Column(String(3), default='USD', nullable=False)
 
     # Details
@@ -35,7 +40,7 @@ class Product(BaseModel):
     size = Column(String(50), nullable=True)  # '50ml', '30g', etc.
 
     # Ratings and Reviews
-    avg_rating = Column(Numeric(3, 2), nullable=True)  # 0.00 to 5.00
+    avg_rating = Column(FloatNumeric(3, 2), nullable=True)  # 0.00 to 5.00
     review_count = Column(Integer, default=0, nullable=False)
 
     # Attributes
@@ -62,6 +67,29 @@ class Product(BaseModel):
     def __repr__(self):
         return f"<Product(product_id={self.product_id}, name='{self.name}', brand='{self.brand}', category='{self.category}')>"
 
+    # Columns returned by to_dict() / to_dict_query(), in order
+    DICT_COLUMNS = (
+        'product_id', 'name', 'brand', 'category', 'subcategory', 'price', 'currency',
+        'description', 'size', 'avg_rating', 'review_count', 'is_organic', 'is_cruelty_free',
+        'is_vegan', 'is_fragrance_free', 'is_available', 'image_url',
+    )
+
+    @classmethod
+    def to_dict_query(cls):
+        """
+        Core select of the to_dict() columns
+
+        For listings: rows go through row_to_dict() without building ORM
+        objects. Extra columns added to the select are ignored.
+        """
+        return select(*(cls.__table__.c[name] for name in cls.DICT_COLUMNS))
+
+    @classmethod
+    def row_to_dict(cls, row):
+        """Same dictionary as to_dict(), from a to_dict_query() row"""
+        mapping = row._mapping
+        return {name: mapping[name] for name in cls.DICT_COLUMNS}
+
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -70,11 +98,11 @@ class Product(BaseModel):
             'brand': self.brand,
             'category': self.category,
             'subcategory': self.subcategory,
-            'price': float(self.price) if self.price else None,
+            'price': self.price,
             'currency': self.currency,
             'description': self.description,
             'size': self.size,
-            'avg_rating': float(self.avg_rating) if self.avg_rating else None,
+            'avg_rating': self.avg_rating,
             'review_count': self.review_count,
             'is_organic': self.is_organic,
             'is_cruelty_free': self.is_cruelty_free,
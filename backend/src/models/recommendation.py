@@ -2,10 +2,10 @@
 Recommendation Model
 Fact table storing recommendation results from the ML engine
 """
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, String, Text, DateTime, JSON
+from sqlalchemy import Column, Integer, ForeignKey, String, Text, DateTime, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from src.models.base import BaseModel
+from src.models.base import BaseModel, FloatNumeric, utcnow
 
 
 class Recommendation(BaseModel):
@@ -23,8 +23,8 @@ class Recommendation(BaseModel):
     date_id = Column(Integer, ForeignKey('dim_date.date_id'), nullable=True)
 
     # Recommendation Metrics
-    relevance_score = Column(Numeric(5, 4), nullable=False)  # 0.0000 to 1.0000
-    confidence_score = Column(Numeric(5, 4), nullable=True)  # Model confidence
+    relevance_score = Column(FloatNumeric(5, 4), nullable=False)  # 0.0000 to 1.0000
+    confidence_score = Column(FloatNumeric(5, 4), nullable=True)  # Model confidence
     rank = Column(Integer, nullable=True)  # Ranking in recommendation list
 
     # Algorithm Information
@@ -48,7 +48,9 @@ class Recommendation(BaseModel):
     feedback_timestamp = Column(DateTime, nullable=True)
 
     # Timestamp
-    recommended_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    recommended_at = Column(
+        DateTime, default=datetime.utcnow, server_default=utcnow(), nullable=False
+    )
 
     # Relationships
     user = relationship('User', back_populates='recommendations')
@@ -63,8 +65,8 @@ class Recommendation(BaseModel):
             'recommendation_id': self.recommendation_id,
             'user_id': self.user_id,
             'product_id': self.product_id,
-            'relevance_score': float(self.relevance_score),
-            'confidence_score': float(self.confidence_score) if self.confidence_score else None,
+            'relevance_score': self.relevance_score,
+            'confidence_score': self.confidence_score,
             'rank': self.rank,
             'algorithm_used': self.algorithm_used,
             'model_version': self.model_version,
@@ -0,0 +1,32 @@
+"""
+SkincareProduct Model
+Skincare products parsed from the JD and TB listing pages
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from src.config import Base
+from src.models.base import trigram_index
+
+
+class SkincareProduct(Base):
+    """护肤品数据表"""
+    __tablename__ = 'skincare_products'
+    __table_args__ = (
+        # 名称模糊搜索 (LIKE '%关键词%')；关键词少于3个字符时 pg_trgm 无法使用索引
+        trigram_index('skincare_name_trgm_idx', '名称'),
+        # 平台筛选 + 按序号排序（序号本身是主键）
+        Index('skincare_platform_seq_idx', '平台', '序号'),
+        # 按价格排序 / 价格区间统计
+        Index('skincare_price_idx', '价格'),
+    )
+
+    序号 = Column(Integer, primary_key=True)
+    平台 = Column(String(10), nullable=False)  # 'JD' or 'TB'
+    页数 = Column(Integer, nullable=False)
+    页内序号 = Column(Integer, nullable=False)
+    名称 = Column(String(500), nullable=False)
+    价格 = Column(Float, nullable=True)
+    用户评价数 = Column(String(50), nullable=True)  # 京东
+    用户购买数 = Column(String(50), nullable=True)  # 淘宝
+    推荐程度 = Column(Float, nullable=True)  # 基于序号计算
+    created_at = Column(DateTime, default=datetime.utcnow)
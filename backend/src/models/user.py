@@ -37,7 +37,10 @@ class User(BaseModel):
     last_login = Column(DateTime, nullable=True)
 
     # Relationships
-    concerns = relationship('UserConcern', back_populates='user', cascade='all, delete-orphan')
+    concerns = relationship(
+        'UserConcern', back_populates='user', cascade='all, delete-orphan',
+        order_by='UserConcern.concern_id'
+    )
     allergies = relationship('UserAllergy', back_populates='user', cascade='all, delete-orphan')
     ratings = relationship('UserRating', back_populates='user', cascade='all, delete-orphan')
     recommendations = relationship('Recommendation', back_populates='user')
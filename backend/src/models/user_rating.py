@@ -2,10 +2,10 @@
 UserRating Model
 User ratings and reviews for products
 """
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, Text, String, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Text, String, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from src.models.base import BaseModel
+from src.models.base import BaseModel, FloatNumeric
 
 
 class UserRating(BaseModel):
@@ -13,15 +13,24 @@ class UserRating(BaseModel):
     User product ratings and reviews
     """
     __tablename__ = 'user_rating'
+    __table_args__ = (
+        # Rating lookups by user / by product (also serve plain user_id /
+        # product_id filters). The included column makes the recommendation
+        # engine's (user_id, product_id, rating) reads index-only scans
+        Index('idx_rating_user_rating', 'user_id', 'rating', postgresql_include=['product_id']),
+        Index('idx_rating_product_rating', 'product_id', 'rating', postgresql_include=['user_id']),
+    )
 
     rating_id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Foreign Keys
-    user_id = Column(Integer, ForeignKey('dim_user.user_id', ondelete='CASCADE'), nullable=False, index=True)
-    product_id = Column(Integer, ForeignKey('dim_product.product_id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('dim_user.user_id', ondelete='CASCADE'), nullable=False)
+    product_id = Column(
+        Integer, ForeignKey('dim_product.product_id', ondelete='CASCADE'), nullable=False
+    )
 
     # Rating (1-5 scale)
-    rating = Column(Numeric(2, 1), nullable=False)  # 1.0 to 5.0
+    rating = Column(FloatNumeric(2, 1), nullable=False)  # 1.0 to 5.0
 
     # Review
     review_text = Column(Text, nullable=True)
@@ -36,7 +45,7 @@ class UserRating(BaseModel):
     unhelpful_count = Column(Integer, default=0, nullable=False)
 
     # Timestamp
-    reviewed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    reviewed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Relationships
     user = relationship('User', back_populates='ratings')
@@ -50,7 +59,7 @@ class UserRating(BaseModel):
             'rating_id': self.rating_id,
             'user_id': self.user_id,
             'product_id': self.product_id,
-            'rating': float(self.rating),
+            'rating': self.rating,
             'review_text': self.review_text,
             'review_title': self.review_title,
             'skin_type_at_review': self.skin_type_at_review,
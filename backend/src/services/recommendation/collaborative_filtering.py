@@ -7,14 +7,77 @@ References:
   "Item-based collaborative filtering recommendation algorithms."
   Proceedings of the 10th international conference on World Wide Web.
 """
+import hashlib
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.neighbors import NearestNeighbors
-from typing import List, Dict, Tuple
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import logging
+from src.utils.cache import TTLCache
+from src.utils.ranking import top_k_indices, top_k_neighbors
 
 logger = logging.getLogger(__name__)
 
+# Neighbour tables of recent trainings, keyed by rating-set fingerprint, so
+# retraining on unchanged ratings skips the similarity computation. A
+# training stores one table for the global model and one per skin type model
+# (5 skin types), so this keeps the tables of the last 4 trainings
+_fit_cache = TTLCache(maxsize=4 * 6, ttl=24 * 3600)
+
+
+class RatingColumns:
+    """
+    Ratings stored as parallel NumPy columns (one element per rating)
+
+    Accepted by CollaborativeFiltering.train in place of a list of rating
+    dicts, so ratings read straight from the database skip the dict layer.
+    The optional skin_types column (the reviewer's skin type per rating)
+    enables per skin type models.
+    """
+
+    def __init__(self, user_ids, product_ids, ratings, skin_types=None):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.skin_types = None if skin_types is None else np.asarray(skin_types, dtype=object)
+
+    # One packed record per rating while reading
+    _ROW_DTYPE = np.dtype([('user_id', np.int64), ('product_id', np.int64), ('rating', np.float32)])
+    _SKIN_TYPE_ROW_DTYPE = np.dtype(_ROW_DTYPE.descr + [('skin_type', object)])
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Tuple], count: int = -1, with_skin_type: bool = False
+    ) -> 'RatingColumns':
+        """
+        Columns of an iterable of (user_id, product_id, rating) tuples, or
+        (user_id, product_id, rating, skin_type) tuples if with_skin_type
+
+        The iterable is consumed once, straight into a packed NumPy buffer
+        (grown geometrically when count is unknown), so it can be a streamed
+        database result: no list of rows is ever held.
+        """
+        dtype = cls._SKIN_TYPE_ROW_DTYPE if with_skin_type else cls._ROW_DTYPE
+        table = np.fromiter(rows, dtype=dtype, count=count)
+        return cls(
+            table['user_id'], table['product_id'], table['rating'],
+            table['skin_type'] if with_skin_type else None,
+        )
+
+    @classmethod
+    def from_dicts(cls, ratings: List[Dict]) -> 'RatingColumns':
+        """Columns of a list of rating dicts (user_id, product_id, rating)"""
+        return cls.from_rows(
+            ((r['user_id'], r['product_id'], r['rating']) for r in ratings), count=len(ratings)
+        )
+
+    def subset(self, mask) -> 'RatingColumns':
+        """Ratings selected by a boolean mask (without the skin_types column)"""
+        return RatingColumns(self.user_ids[mask], self.product_ids[mask], self.ratings[mask])
+
+    def __len__(self):
+        return len(self.ratings)
+
 
 class CollaborativeFiltering:
     """
@@ -22,13 +85,21 @@ class CollaborativeFiltering:
 
     Algorithm:
     1. Build user-item rating matrix
-    2. Calculate item-item similarity using cosine similarity
+    2. Calculate item-item similarity using adjusted cosine similarity
+       (ratings centred on each user's mean)
     3. For target user, find items similar to items they've rated highly
     4. Generate recommendations based on similarity scores
 
     Reference: Sarwar et al. (2001)
     """
 
+    # Similar items kept per item; also the neighbourhood each liked item
+    # contributes when generating recommendations
+    CANDIDATES_PER_ITEM = 20
+
+    # Minimum number of ratings from one skin type to train a model for it
+    MIN_SEGMENT_RATINGS = 50
+
     def __init__(self, n_neighbors=10, min_rating=3.5):
         """
         Initialize collaborative filtering engine
@@ -39,54 +110,90 @@ class CollaborativeFiltering:
         """
         self.n_neighbors = n_neighbors
         self.min_rating = min_rating
-        self.model = None
         self.item_ids = None
+        self.item_id_to_idx = None
+        self.user_id_to_idx = None
         self.user_item_matrix = None
+        self.fingerprint = None
+        self.neighbor_indices = None
+        self.neighbor_scores = None
+        self.segment_models = {}
 
-    def build_user_item_matrix(self, ratings: List[Dict]) -> np.ndarray:
+    def build_user_item_matrix(self, ratings: Union[List[Dict], RatingColumns]) -> sp.csr_matrix:
         """
         Build user-item rating matrix from rating data
 
         Args:
-            ratings: List of rating dictionaries with keys: user_id, product_id, rating
+            ratings: List of rating dictionaries with keys: user_id, product_id, rating,
+                or the same data as RatingColumns
 
         Returns:
-            User-item matrix (users x items)
+            Sparse CSR user-item matrix (users x items)
         """
         if not ratings:
             logger.warning("No ratings provided for building matrix")
             return np.array([[]])
 
-        # Get unique users and items
-        users = sorted(set(r['user_id'] for r in ratings))
-        items = sorted(set(r['product_id'] for r in ratings))
-
-        # Create mapping
-        user_idx = {user_id: idx for idx, user_id in enumerate(users)}
-        item_idx = {item_id: idx for idx, item_id in enumerate(items)}
-
-        # Initialize matrix
-        matrix = np.zeros((len(users), len(items)))
-
-        # Fill matrix
-        for rating in ratings:
-            u_idx = user_idx[rating['user_id']]
-            i_idx = item_idx[rating['product_id']]
-            matrix[u_idx, i_idx] = rating['rating']
-
-        self.item_ids = items
+        # Columns of the rating list
+        if not isinstance(ratings, RatingColumns):
+            ratings = RatingColumns.from_dicts(ratings)
+        count = len(ratings)
+        user_col, item_col, values = ratings.user_ids, ratings.product_ids, ratings.ratings
+
+        # Unique (sorted) users and items, and each rating's row / column index
+        users, rows = np.unique(user_col, return_inverse=True)
+        items, cols = np.unique(item_col, return_inverse=True)
+
+        # One entry per (user, item); a repeated rating overrides the earlier one
+        cells = rows * len(items) + cols
+        _, last = np.unique(cells[::-1], return_index=True)
+        keep = count - 1 - last
+        rows, cols, data = rows[keep], cols[keep], values[keep]
+
+        # Content hash of the deduplicated ratings (entries are in cell order,
+        # so it doesn't depend on the order of the input list)
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (users, items, rows, cols, data):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        self.fingerprint = digest.hexdigest()
+
+        # Sparse matrix: most users rate only a few of the products. Ratings
+        # (1.0-5.0) and their similarities fit float32, halving memory traffic
+        matrix = sp.coo_matrix((data, (rows, cols)), shape=(len(users), len(items))).tocsr()
+
+        self.item_ids = items.tolist()
+        self.item_id_to_idx = {item_id: idx for idx, item_id in enumerate(self.item_ids)}
+        self.user_id_to_idx = {user_id: idx for idx, user_id in enumerate(users.tolist())}
         self.user_item_matrix = matrix
 
-        logger.info(f"Built user-item matrix: {matrix.shape[0]} users x {matrix.shape[1]} items")
+        logger.info("Built user-item matrix: %s users x %s items", matrix.shape[0], matrix.shape[1])
 
         return matrix
 
-    def train(self, ratings: List[Dict]):
+    @staticmethod
+    def center_ratings(matrix: sp.csr_matrix) -> sp.csr_matrix:
+        """
+        Subtract each user's mean rating from their stored ratings
+
+        Args:
+            matrix: Sparse CSR user-item matrix (users x items)
+
+        Returns:
+            Centred copy of the matrix (unrated cells stay empty)
+        """
+        centered = matrix.copy()
+        counts = np.diff(centered.indptr)
+        sums = np.asarray(centered.sum(axis=1), dtype=centered.dtype).ravel()
+        means = sums / np.maximum(counts, 1)
+        centered.data -= np.repeat(means, counts)
+        return centered
+
+    def train(self, ratings: Union[List[Dict], RatingColumns]):
         """
         Train the collaborative filtering model
 
         Args:
-            ratings: List of rating dictionaries
+            ratings: List of rating dictionaries, or RatingColumns
         """
         logger.info("Training collaborative filtering model...")
 
@@ -97,19 +204,81 @@ class CollaborativeFiltering:
             logger.warning("Empty rating matrix, cannot train model")
             return
 
-        # Transpose to get item-user matrix (items x users)
-        item_user_matrix = matrix.T
+        # Looked up before the skin type models are trained, as they add
+        # cache entries of their own
+        cache_key = (self.fingerprint, self.CANDIDATES_PER_ITEM)
+        cached_fit = _fit_cache.get(cache_key)
+
+        # Models of the ratings given by users of each skin type
+        self.segment_models = self.train_segments(ratings)
+
+        if cached_fit is not None:
+            self.neighbor_indices, self.neighbor_scores = cached_fit
+            logger.info("Reused trained model for %s items", len(self.item_ids))
+            return
 
-        # Train NearestNeighbors model on item vectors
-        # Use cosine similarity (1 - cosine_distance)
-        self.model = NearestNeighbors(
-            n_neighbors=min(self.n_neighbors, len(self.item_ids)),
-            metric='cosine',
-            algorithm='brute'
+        # Adjusted cosine (Sarwar et al.): subtract each user's mean rating
+        # from their ratings, so similarity measures agreement in preference
+        # rather than how many users rated both items
+        centered = self.center_ratings(matrix)
+
+        # Transpose to get item-user matrix (items x users), rows L2-normalised
+        # so dot products are cosine similarities. Items whose centred ratings
+        # are all zero keep a zero row and are similar to nothing
+        item_user_matrix = normalize(centered.T.tocsr())
+
+        # Precompute each item's most similar items once; lookups and
+        # recommendations then only read this (items x K) table
+        self.neighbor_indices, self.neighbor_scores = top_k_neighbors(
+            item_user_matrix, self.CANDIDATES_PER_ITEM
         )
-        self.model.fit(item_user_matrix)
 
-        logger.info(f"Trained model with {len(self.item_ids)} items")
+        # Only positively correlated items count as neighbours: adjusted cosine
+        # is negative for items users rate oppositely, and zero for unrelated
+        # ones. Rows are best first, so the dropped entries are the row's tail
+        # and get the same padding as rows with too few items
+        not_similar = self.neighbor_scores <= 0
+        self.neighbor_indices[not_similar] = -1
+        self.neighbor_scores[not_similar] = -np.inf
+
+        # Shared between models trained on the same ratings
+        self.neighbor_indices.setflags(write=False)
+        self.neighbor_scores.setflags(write=False)
+        _fit_cache.set(cache_key, (self.neighbor_indices, self.neighbor_scores))
+
+        logger.info("Trained model with %s items", len(self.item_ids))
+
+    def train_segments(self, ratings) -> Dict[str, 'CollaborativeFiltering']:
+        """
+        Train one model per reviewer skin type
+
+        Each model only sees the ratings given by users of that skin type,
+        so its neighbours reflect what works for that skin type. Skin types
+        with fewer than MIN_SEGMENT_RATINGS ratings are left to the global model.
+
+        Args:
+            ratings: RatingColumns with skin_types (anything else: no segments)
+
+        Returns:
+            Dictionary of skin type -> trained model
+        """
+        if not isinstance(ratings, RatingColumns) or ratings.skin_types is None:
+            return {}
+
+        segment_models = {}
+        for skin_type in set(ratings.skin_types.tolist()) - {None}:
+            mask = ratings.skin_types == skin_type
+            if np.count_nonzero(mask) < self.MIN_SEGMENT_RATINGS:
+                continue
+
+            model = CollaborativeFiltering(n_neighbors=self.n_neighbors, min_rating=self.min_rating)
+            model.train(ratings.subset(mask))
+            segment_models[skin_type] = model
+
+        if segment_models:
+            logger.info("Trained skin type models: %s", sorted(segment_models))
+
+        return segment_models
 
     def get_item_similarities(self, item_id: int, n_similar: int = 10) -> List[Tuple[int, float]]:
         """
@@ -117,43 +286,59 @@ class CollaborativeFiltering:
 
         Args:
             item_id: Target item ID
-            n_similar: Number of similar items to return
+            n_similar: Number of similar items to return (at most CANDIDATES_PER_ITEM)
 
         Returns:
             List of (item_id, similarity_score) tuples
         """
-        if self.model is None or self.item_ids is None:
+        if self.neighbor_indices is None or self.item_ids is None:
             logger.error("Model not trained")
             return []
 
-        if item_id not in self.item_ids:
-            logger.warning(f"Item {item_id} not in training data")
-            return []
-
         # Get item index
-        item_idx = self.item_ids.index(item_id)
+        item_idx = self.item_id_to_idx.get(item_id)
+        if item_idx is None:
+            logger.warning("Item %s not in training data", item_id)
+            return []
 
-        # Get item vector
-        item_vector = self.user_item_matrix.T[item_idx].reshape(1, -1)
+        # Similar items (excluding the item itself), best first
+        similar_items = []
+        neighbors = self.neighbor_indices[item_idx, :n_similar]
+        scores = self.neighbor_scores[item_idx, :n_similar]
+        for idx, sim in zip(neighbors, scores):
+            if idx < 0 or sim <= 0:
+                break
+            similar_items.append((self.item_ids[idx], float(sim)))
 
-        # Find similar items
-        distances, indices = self.model.kneighbors(
-            item_vector,
-            n_neighbors=min(n_similar + 1, len(self.item_ids))
-        )
+        return similar_items
 
-        # Convert distances to similarities (cosine similarity = 1 - cosine distance)
-        similarities = 1 - distances[0]
+    def similarity_rows(self) -> List[Dict]:
+        """
+        The neighbour table as rows for storage (positive similarities only)
 
-        # Return similar items (excluding the item itself)
-        similar_items = []
-        for idx, sim in zip(indices[0][1:], similarities[1:]):
-            similar_item_id = self.item_ids[idx]
-            similar_items.append((similar_item_id, float(sim)))
+        Returns:
+            List of dictionaries with keys: product_id, similar_product_id, similarity, rank
+        """
+        if self.neighbor_indices is None or self.item_ids is None:
+            return []
 
-        return similar_items
+        items, ranks = np.nonzero((self.neighbor_indices >= 0) & (self.neighbor_scores > 0))
+        neighbors = self.neighbor_indices[items, ranks]
+        similarities = self.neighbor_scores[items, ranks]
+
+        item_ids = self.item_ids
+        return [
+            {
+                'product_id': item_ids[i],
+                'similar_product_id': item_ids[j],
+                'similarity': round(float(sim), 4),
+                'rank': int(rank) + 1,
+            }
+            for i, j, sim, rank in zip(items.tolist(), neighbors.tolist(), similarities, ranks)
+        ]
 
-    def recommend(self, user_id: int, user_ratings: List[Dict], n_recommendations: int = 10, exclude_rated: bool = True) -> List[Dict]:
+    def recommend(self, user_id: int, user_ratings: List[Dict], n_recommendations: int = 10,
+                  exclude_rated: bool = True, skin_type: Optional[str] = None) -> List[Dict]:
         """
         Generate recommendations for a user based on collaborative filtering
 
@@ -162,14 +347,24 @@ class CollaborativeFiltering:
             user_ratings: User's rating history
             n_recommendations: Number of recommendations to generate
             exclude_rated: Whether to exclude already rated items
+            skin_type: User's skin type; uses that skin type's model when there
+                is one and it has recommendations, otherwise the global model
 
         Returns:
             List of recommendation dictionaries with keys: product_id, score, reasoning
         """
-        if self.model is None or self.item_ids is None:
+        if self.neighbor_indices is None or self.item_ids is None:
             logger.error("Model not trained, cannot generate recommendations")
             return []
 
+        segment_model = self.segment_models.get(skin_type)
+        if segment_model is not None:
+            recommendations = segment_model.recommend(
+                user_id, user_ratings, n_recommendations, exclude_rated
+            )
+            if recommendations:
+                return recommendations
+
         # Get user's highly rated items (rating >= min_rating)
         liked_items = [
             r['product_id'] for r in user_ratings
@@ -177,53 +372,80 @@ class CollaborativeFiltering:
         ]
 
         if not liked_items:
-            logger.warning(f"User {user_id} has no highly rated items (>= {self.min_rating})")
+            logger.warning("User %s has no highly rated items (>= %s)", user_id, self.min_rating)
             return []
 
-        # Get rated items for exclusion
-        rated_items = set(r['product_id'] for r in user_ratings) if exclude_rated else set()
-
-        # Find similar items for each liked item
-        candidate_items = {}  # {item_id: [similarities]}
-
-        for liked_item in liked_items:
-            similar_items = self.get_item_similarities(liked_item, n_similar=20)
-
-            for item_id, similarity in similar_items:
-                # Skip already rated items
-                if exclude_rated and item_id in rated_items:
-                    continue
-
-                if item_id not in candidate_items:
-                    candidate_items[item_id] = []
+        # Liked items present in the training data, in the user's order
+        liked_ids = [item_id for item_id in liked_items if item_id in self.item_id_to_idx]
+        if not liked_ids:
+            return []
+        liked_idx = np.array([self.item_id_to_idx[item_id] for item_id in liked_ids])
+
+        # (source, neighbour, similarity) for every neighbour of every liked
+        # item, flattened in liked-item order, then neighbour rank order
+        n_items = len(self.item_ids)
+        neighbors = self.neighbor_indices[liked_idx].ravel()
+        similarities = self.neighbor_scores[liked_idx].ravel()
+        sources = np.repeat(np.arange(len(liked_idx)), self.neighbor_indices.shape[1])
+
+        # Padding and non-positive similarities (tables trained before they
+        # were dropped at training time) are not neighbours
+        keep = (neighbors >= 0) & (similarities > 0)
+
+        # Skip already rated items
+        if exclude_rated:
+            rated = np.zeros(n_items, dtype=bool)
+            rated[[self.item_id_to_idx[r['product_id']] for r in user_ratings
+                   if r['product_id'] in self.item_id_to_idx]] = True
+            keep &= ~rated[np.maximum(neighbors, 0)]
+
+        neighbors, similarities, sources = neighbors[keep], similarities[keep], sources[keep]
+        if len(neighbors) == 0:
+            return []
 
-                candidate_items[item_id].append({
-                    'similarity': similarity,
-                    'source_item': liked_item
-                })
+        # Aggregate scores for candidate items (average similarity over the
+        # liked items they are similar to): a scatter-add of the entries into
+        # per-item totals, no sorting or grouping
+        counts = np.bincount(neighbors, minlength=n_items)
+        totals = np.bincount(neighbors, weights=similarities, minlength=n_items)
+        candidates = np.flatnonzero(counts)
+        scores = totals[candidates] / counts[candidates]
+
+        # Position of each item's first entry, so ties keep the order in
+        # which candidates were first seen
+        first_found = np.full(n_items, len(neighbors))
+        np.minimum.at(first_found, neighbors, np.arange(len(neighbors)))
+
+        # Partial selection of the top N (earlier-found first among ties);
+        # result dicts are built only for these
+        top = top_k_indices(scores, n_recommendations, tiebreak=-first_found[candidates])
+
+        # Entries of the returned items grouped per item (in entry order), so
+        # their best similarity and first sources come from one pass
+        winners = candidates[top]
+        slot = np.full(n_items, -1)
+        slot[winners] = np.arange(len(winners))
+        entry_slot = slot[neighbors]
+        entries = np.flatnonzero(entry_slot >= 0)
+        entries = entries[np.argsort(entry_slot[entries], kind='stable')]
+        bounds = np.searchsorted(entry_slot[entries], np.arange(len(winners) + 1))
+        top_similarity = np.maximum.reduceat(similarities[entries], bounds[:-1])
 
-        # Aggregate scores for candidate items
         recommendations = []
-
-        for item_id, similarities in candidate_items.items():
-            # Calculate aggregated score (average similarity)
-            avg_similarity = np.mean([s['similarity'] for s in similarities])
-
-            # Create reasoning
-            top_source = max(similarities, key=lambda x: x['similarity'])
-
+        for k, i in enumerate(top):
+            item = winners[k]
+            start, end = bounds[k], bounds[k + 1]
             recommendations.append({
-                'product_id': item_id,
-                'score': float(avg_similarity),
+                'product_id': self.item_ids[item],
+                'score': float(scores[i]),
                 'reasoning': {
                     'algorithm': 'collaborative_filtering',
-                    'similar_to': [s['source_item'] for s in similarities[:3]],
-                    'top_similarity': float(top_source['similarity']),
-                    'num_similar_items': len(similarities),
+                    'similar_to': [
+                        liked_ids[j] for j in sources[entries[start:min(start + 3, end)]]
+                    ],
+                    'top_similarity': float(top_similarity[k]),
+                    'num_similar_items': int(counts[item]),
                 }
             })
 
-        # Sort by score and return top N
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
-
-        return recommendations[:n_recommendations]
+        return recommendations
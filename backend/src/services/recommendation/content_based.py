@@ -8,14 +8,72 @@ References:
   The adaptive web (pp. 325-341). Springer.
 """
 import numpy as np
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from typing import List, Dict
-import json
 import logging
+import orjson
+from src.utils.ranking import top_k_indices
 
 logger = logging.getLogger(__name__)
 
+# Product fields the feature string is built from
+FEATURE_FIELDS = (
+    'category', 'ingredients', 'target_concerns', 'is_organic', 'is_cruelty_free',
+    'is_vegan', 'is_fragrance_free', 'suitable_for_skin_types', 'brand',
+)
+
+# Boolean product attributes and the term each contributes
+ATTRIBUTE_FLAGS = (
+    ('is_organic', 'organic'),
+    ('is_cruelty_free', 'cruelty_free'),
+    ('is_vegan', 'vegan'),
+    ('is_fragrance_free', 'fragrance_free'),
+)
+
+
+def _json_list(value) -> list:
+    """List stored in a JSON column; the database usually returns it parsed already"""
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return []
+    return value
+
+
+def _feature_key(product: Dict) -> bytes:
+    """Snapshot of the product fields that feed the feature string, encoded in one orjson call"""
+    return orjson.dumps(
+        [product.get(field) for field in FEATURE_FIELDS],
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        default=str,
+    )
+
+
+class CachedAnalyzer:
+    """
+    TF-IDF analyzer that reuses the terms of known documents
+
+    ``terms`` maps document text to its analyzed terms; other documents
+    (e.g. user profiles) are analyzed without being added.
+    """
+
+    def __init__(self, analyzer, terms):
+        self.analyzer = analyzer
+        self.terms = terms
+
+    def __call__(self, doc):
+        terms = self.terms.get(doc)
+        if terms is None:
+            terms = self.analyzer(doc)
+        return terms
+
 
 class ContentBasedFiltering:
     """
@@ -44,11 +102,38 @@ class ContentBasedFiltering:
             'concerns': 1.5,
             'attributes': 0.5,
         }
+
+        # Times each weighted section is repeated in a product's feature string
+        self._category_repeat = int(self.feature_weights.get('category', 1) * 3)
+        self._ingredients_repeat = int(self.feature_weights.get('ingredients', 1))
+        self._concerns_repeat = int(self.feature_weights.get('concerns', 1) * 2)
+        self._attributes_repeat = int(self.feature_weights.get('attributes', 1))
+
         self.tfidf_vectorizer = None
         self.product_vectors = None
         self.product_ids = None
+        self.product_id_to_idx = None
         self.product_features = None
 
+        # Target concerns of each product as a bitmask over the concern
+        # vocabulary, and suitable skin types as a set (rows aligned with
+        # product_vectors), for the recommendation reasoning
+        self._concern_bits = {}
+        self._concern_names = []
+        self._product_concern_masks = []
+        self._product_skin_types = []
+
+        # product_id -> (feature key, feature string) and feature string ->
+        # analyzed terms, from the previous training; unchanged products are
+        # neither rebuilt nor re-tokenized on retrain
+        self._feature_cache = {}
+        self._term_cache = {}
+
+        # Document frequency of each vocabulary term and number of documents,
+        # kept so partial_train can update the IDF without refitting
+        self._df = None
+        self._n_docs = 0
+
     def extract_product_features(self, products: List[Dict]) -> List[str]:
         """
         Extract and concatenate product features into text representations
@@ -60,68 +145,46 @@ class ContentBasedFiltering:
             List of feature strings for each product
         """
         feature_strings = []
+        feature_cache = {}
 
         for product in products:
-            features = []
-
-            # Category (weighted)
-            category = product.get('category', '')
-            features.extend([category] * int(self.feature_weights.get('category', 1) * 3))
-
-            # Ingredients (weighted)
-            ingredients = product.get('ingredients', [])
-            if isinstance(ingredients, str):
-                try:
-                    ingredients = json.loads(ingredients)
-                except:
-                    ingredients = []
-            ingredient_text = ' '.join(ing.get('name', '') for ing in ingredients if isinstance(ing, dict))
-            features.extend([ingredient_text] * int(self.feature_weights.get('ingredients', 1)))
-
-            # Target concerns (weighted)
-            concerns = product.get('target_concerns', [])
-            if isinstance(concerns, str):
-                try:
-                    concerns = json.loads(concerns)
-                except:
-                    concerns = []
-            concerns_text = ' '.join(concerns) if concerns else ''
-            features.extend([concerns_text] * int(self.feature_weights.get('concerns', 1) * 2))
-
-            # Attributes (weighted)
-            attributes = []
-            if product.get('is_organic'):
-                attributes.append('organic')
-            if product.get('is_cruelty_free'):
-                attributes.append('cruelty_free')
-            if product.get('is_vegan'):
-                attributes.append('vegan')
-            if product.get('is_fragrance_free'):
-                attributes.append('fragrance_free')
-
-            attributes_text = ' '.join(attributes)
-            features.extend([attributes_text] * int(self.feature_weights.get('attributes', 1)))
-
-            # Suitable skin types
-            skin_types = product.get('suitable_for_skin_types', [])
-            if isinstance(skin_types, str):
-                try:
-                    skin_types = json.loads(skin_types)
-                except:
-                    skin_types = []
-            skin_types_text = ' '.join(skin_types) if skin_types else ''
-            features.append(skin_types_text)
-
-            # Brand
-            brand = product.get('brand', '')
-            features.append(brand)
-
-            # Combine all features
-            feature_string = ' '.join(filter(None, features))
+            product_id = product.get('product_id')
+            key = _feature_key(product)
+            cached = self._feature_cache.get(product_id)
+            if cached is not None and cached[0] == key:
+                feature_string = cached[1]
+            else:
+                feature_string = self._build_feature_string(product)
+
+            feature_cache[product_id] = (key, feature_string)
             feature_strings.append(feature_string)
 
+        self._feature_cache = feature_cache
+
         return feature_strings
 
+    def _build_feature_string(self, product: Dict) -> str:
+        """Text representation of one product"""
+        ingredients = _json_list(product.get('ingredients'))
+        ingredient_text = ' '.join(
+            [ing.get('name', '') for ing in ingredients if isinstance(ing, dict)]
+        )
+
+        concerns = _json_list(product.get('target_concerns'))
+        skin_types = _json_list(product.get('suitable_for_skin_types'))
+        attributes_text = ' '.join([name for field, name in ATTRIBUTE_FLAGS if product.get(field)])
+
+        # Each weighted section repeated by its precomputed count; empty
+        # sections are dropped
+        features = (
+            [product.get('category', '')] * self._category_repeat
+            + [ingredient_text] * self._ingredients_repeat
+            + [' '.join(concerns) if concerns else ''] * self._concerns_repeat
+            + [attributes_text] * self._attributes_repeat
+            + [' '.join(skin_types) if skin_types else '', product.get('brand', '')]
+        )
+        return ' '.join(filter(None, features))
+
     def train(self, products: List[Dict]):
         """
         Train the content-based model by building TF-IDF vectors
@@ -136,24 +199,138 @@ class ContentBasedFiltering:
             return
 
         self.product_ids = [p['product_id'] for p in products]
+        self.product_id_to_idx = {
+            product_id: idx for idx, product_id in enumerate(self.product_ids)
+        }
         self.product_features = products
+        self._concern_bits = {}
+        self._concern_names = []
+        self._product_concern_masks = self._concern_masks(products)
+        self._product_skin_types = self._skin_type_sets(products)
 
         # Extract product features
         feature_strings = self.extract_product_features(products)
 
+        # Tokenize (English stop words removed, unigrams + bigrams), reusing
+        # the terms of documents seen in the previous training
+        analyzer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).build_analyzer()
+        previous_terms = self._term_cache
+        self._term_cache = {}
+        for doc in feature_strings:
+            if doc not in self._term_cache:
+                terms = previous_terms.get(doc)
+                self._term_cache[doc] = terms if terms is not None else analyzer(doc)
+
         # Build TF-IDF vectors
         self.tfidf_vectorizer = TfidfVectorizer(
+            analyzer=CachedAnalyzer(analyzer, self._term_cache),
             max_features=1000,
-            stop_words='english',
-            ngram_range=(1, 2),
             min_df=1,
             max_df=0.8,
         )
 
-        self.product_vectors = self.tfidf_vectorizer.fit_transform(feature_strings)
+        # Rows L2-normalised once, so cosine similarity is a sparse dot product;
+        # stored as float32 (plenty for ranking), which halves the memory the
+        # similarity product has to stream
+        self.product_vectors = normalize(
+            self.tfidf_vectorizer.fit_transform(feature_strings), norm='l2', copy=False
+        ).astype(np.float32)
 
-        logger.info(f"Trained content model with {len(products)} products, "
-                   f"vocabulary size: {len(self.tfidf_vectorizer.vocabulary_)}")
+        self._df = np.bincount(
+            self.product_vectors.indices, minlength=self.product_vectors.shape[1]
+        )
+        self._n_docs = self.product_vectors.shape[0]
+
+        logger.info("Trained content model with %s products, vocabulary size: %s",
+                    len(products), len(self.tfidf_vectorizer.vocabulary_))
+
+    def _concern_masks(self, products: List[Dict]) -> List[int]:
+        """
+        Target concerns of each product as a bitmask (bit i = concern
+        _concern_names[i]); concerns not seen before get the next bit.
+        Python ints, so the concern vocabulary is not limited to 64 entries
+        """
+        masks = []
+        for product in products:
+            mask = 0
+            for concern in _json_list(product.get('target_concerns')):
+                bit = self._concern_bits.get(concern)
+                if bit is None:
+                    bit = self._concern_bits[concern] = len(self._concern_names)
+                    self._concern_names.append(concern)
+                mask |= 1 << bit
+            masks.append(mask)
+        return masks
+
+    @staticmethod
+    def _skin_type_sets(products: List[Dict]) -> List[frozenset]:
+        """Suitable skin types of each product"""
+        return [frozenset(_json_list(p.get('suitable_for_skin_types'))) for p in products]
+
+    def partial_train(self, new_products: List[Dict]):
+        """
+        Add products to a trained model without refitting it
+
+        The vocabulary stays as fitted (terms it doesn't contain are
+        ignored); document frequencies are updated and the IDF of all
+        vectors is refreshed with refit_idf(). Cost is proportional to the
+        new products, not the catalog. Use train() to rebuild the vocabulary.
+
+        Args:
+            new_products: Product dictionaries not yet in the model
+        """
+        if self.tfidf_vectorizer is None or self.product_vectors is None:
+            self.train(new_products)
+            return
+
+        new_products = [p for p in new_products if p['product_id'] not in self.product_id_to_idx]
+        if not new_products:
+            return
+
+        # Keep the cached feature strings of the products already trained
+        known_features = self._feature_cache
+        feature_strings = self.extract_product_features(new_products)
+        self._feature_cache = {**known_features, **self._feature_cache}
+
+        # Vectors with the current IDF; rescaled by refit_idf below
+        new_vectors = normalize(
+            self.tfidf_vectorizer.transform(feature_strings), norm='l2', copy=False
+        ).astype(np.float32)
+
+        start = len(self.product_ids)
+        self.product_vectors = sp.vstack([self.product_vectors, new_vectors], format='csr')
+        self.product_ids = self.product_ids + [p['product_id'] for p in new_products]
+        self.product_id_to_idx.update(
+            (p['product_id'], idx) for idx, p in enumerate(new_products, start=start)
+        )
+        self.product_features = self.product_features + new_products
+        self._product_concern_masks = (
+            self._product_concern_masks + self._concern_masks(new_products)
+        )
+        self._product_skin_types = self._product_skin_types + self._skin_type_sets(new_products)
+
+        self._df = self._df + np.bincount(new_vectors.indices, minlength=new_vectors.shape[1])
+        self._n_docs += len(new_products)
+        self.refit_idf()
+
+        logger.info("Added %s products to content model (%s total)",
+                    len(new_products), len(self.product_ids))
+
+    def refit_idf(self):
+        """
+        Recompute the (smoothed) IDF from the current document frequencies
+        and rescale the stored product vectors to it
+
+        Each row is tf * idf, L2-normalised; scaling its columns by
+        new_idf / old_idf and normalising again gives tf * new_idf,
+        normalised, without the term counts.
+        """
+        idf = np.log((1 + self._n_docs) / (1 + self._df)) + 1
+        scale = sp.diags(idf / self.tfidf_vectorizer.idf_)
+        self.product_vectors = normalize(
+            self.product_vectors @ scale, norm='l2', copy=False
+        ).tocsr().astype(np.float32)
+        self.tfidf_vectorizer.idf_ = idf
 
     def build_user_profile_vector(self, user_profile: Dict) -> np.ndarray:
         """
@@ -165,6 +342,20 @@ class ContentBasedFiltering:
         Returns:
             TF-IDF vector representing user preferences
         """
+        profile_string = self._build_profile_string(user_profile)
+
+        # Transform using TF-IDF
+        if self.tfidf_vectorizer is None:
+            logger.error("Model not trained, cannot build user profile vector")
+            return np.array([])
+
+        profile_vector = self.tfidf_vectorizer.transform([profile_string])
+
+        return profile_vector
+
+    @staticmethod
+    def _build_profile_string(user_profile: Dict) -> str:
+        """Text representation of a user profile"""
         profile_features = []
 
         # Skin type (most important)
@@ -185,16 +376,16 @@ class ContentBasedFiltering:
             profile_features.extend(['fragrance_free'] * 2)
 
         # Combine
-        profile_string = ' '.join(filter(None, profile_features))
-
-        # Transform using TF-IDF
-        if self.tfidf_vectorizer is None:
-            logger.error("Model not trained, cannot build user profile vector")
-            return np.array([])
+        return ' '.join(filter(None, profile_features))
 
-        profile_vector = self.tfidf_vectorizer.transform([profile_string])
-
-        return profile_vector
+    @staticmethod
+    def _profile_weights(profile_vectors) -> np.ndarray:
+        """Profile TF-IDF rows as dense, L2-normalised float32 arrays"""
+        weights = profile_vectors.toarray()
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        weights /= norms
+        return weights.astype(np.float32)
 
     def recommend(self, user_profile: Dict, n_recommendations: int = 10, exclude_products: List[int] = None) -> List[Dict]:
         """
@@ -212,8 +403,6 @@ class ContentBasedFiltering:
             logger.error("Model not trained, cannot generate recommendations")
             return []
 
-        exclude_products = exclude_products or []
-
         # Build user profile vector
         user_vector = self.build_user_profile_vector(user_profile)
 
@@ -221,18 +410,104 @@ class ContentBasedFiltering:
             logger.warning("Empty user profile vector")
             return []
 
-        # Calculate similarity between user profile and all products
-        similarities = cosine_similarity(user_vector, self.product_vectors)[0]
+        # Calculate similarity between user profile and all products: the
+        # product rows are L2-normalised, so cosine similarity is one CSR
+        # matrix x dense vector product with the normalised profile (the
+        # vocabulary is small, the dense profile costs nothing)
+        similarities = self.product_vectors @ self._profile_weights(user_vector)[0]
+
+        return self._top_recommendations(
+            user_profile, similarities, n_recommendations, exclude_products
+        )
+
+    def recommend_batch(
+        self,
+        user_profiles: List[Dict],
+        n_recommendations: int = 10,
+        exclude_products: List[List[int]] = None,
+        batch_size: int = 256
+    ) -> List[List[Dict]]:
+        """
+        Generate content-based recommendations for many users at once
+
+        Same results as calling recommend() per profile, but the profiles
+        are vectorized together and each block of batch_size users is
+        scored with one sparse matrix x dense matrix product.
+
+        Args:
+            user_profiles: User profile dictionaries
+            n_recommendations: Number of recommendations per user
+            exclude_products: Product IDs to exclude, one list per profile
+            batch_size: Users scored per matrix product (bounds the
+                        products x batch_size similarity block)
+
+        Returns:
+            One list of recommendation dictionaries per profile
+        """
+        if self.tfidf_vectorizer is None or self.product_vectors is None:
+            logger.error("Model not trained, cannot generate recommendations")
+            return [[] for _ in user_profiles]
+
+        exclude_products = exclude_products or [None] * len(user_profiles)
+
+        profile_vectors = self.tfidf_vectorizer.transform(
+            [self._build_profile_string(profile) for profile in user_profiles]
+        )
+        empty = np.diff(profile_vectors.indptr) == 0
+
+        results = []
+        for start in range(0, len(user_profiles), batch_size):
+            stop = min(start + batch_size, len(user_profiles))
+
+            # users x products similarities of this block
+            weights = self._profile_weights(profile_vectors[start:stop])
+            similarities = np.ascontiguousarray((self.product_vectors @ weights.T).T)
+
+            for i in range(start, stop):
+                if empty[i]:
+                    results.append([])
+                    continue
+                results.append(self._top_recommendations(
+                    user_profiles[i], similarities[i - start], n_recommendations,
+                    exclude_products[i]
+                ))
+
+        return results
+
+    def _top_recommendations(
+        self,
+        user_profile: Dict,
+        similarities: np.ndarray,
+        n_recommendations: int,
+        exclude_products: List[int] = None
+    ) -> List[Dict]:
+        """Top N products by similarity, excluding exclude_products, with reasoning"""
+        exclude_products = exclude_products or []
+
+        # Skip excluded products
+        candidates = np.ones(len(similarities), dtype=bool)
+        excluded_idx = [self.product_id_to_idx[product_id] for product_id in set(exclude_products)
+                        if product_id in self.product_id_to_idx]
+        candidates[excluded_idx] = False
+        candidates = np.flatnonzero(candidates)
+
+        # Top N by similarity (ties keep catalog order); reasoning is only
+        # built for these
+        top = candidates[top_k_indices(similarities[candidates], n_recommendations)]
+
+        # Profile fields the reasoning matches against, resolved once
+        user_concern_mask = 0
+        for c in user_profile.get('concerns') or []:
+            bit = self._concern_bits.get(c.get('concern_type', '')) if isinstance(c, dict) else None
+            if bit is not None:
+                user_concern_mask |= 1 << bit
+        user_skin_type = user_profile.get('skin_type', '')
 
         # Create recommendations
         recommendations = []
 
-        for idx, similarity in enumerate(similarities):
-            product_id = self.product_ids[idx]
-
-            # Skip excluded products
-            if product_id in exclude_products:
-                continue
+        for idx in top:
+            similarity = similarities[idx]
 
             # Get product info
             product = self.product_features[idx]
@@ -242,31 +517,23 @@ class ContentBasedFiltering:
                 'algorithm': 'content_based',
                 'similarity_score': float(similarity),
                 'matched_features': {
-                    'skin_type_match': user_profile.get('skin_type') in str(product.get('suitable_for_skin_types', [])),
+                    'skin_type_match': user_skin_type in self._product_skin_types[idx],
                     'category': product.get('category'),
                 },
             }
 
-            # Check concern matches
-            user_concerns = set(c.get('concern_type', '') for c in user_profile.get('concerns', []))
-            product_concerns = product.get('target_concerns', [])
-            if isinstance(product_concerns, str):
-                try:
-                    product_concerns = json.loads(product_concerns)
-                except:
-                    product_concerns = []
-
-            concern_matches = list(user_concerns.intersection(set(product_concerns)))
-            if concern_matches:
-                reasoning['matched_features']['concerns'] = concern_matches
+            # Check concern matches (names decoded only for shared bits)
+            matched = user_concern_mask & self._product_concern_masks[idx]
+            if matched:
+                reasoning['matched_features']['concerns'] = [
+                    name for bit, name in enumerate(self._concern_names[:matched.bit_length()])
+                    if matched >> bit & 1
+                ]
 
             recommendations.append({
-                'product_id': product_id,
+                'product_id': self.product_ids[idx],
                 'score': float(similarity),
                 'reasoning': reasoning,
             })
 
-        # Sort by score
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
-
-        return recommendations[:n_recommendations]
+        return recommendations
@@ -8,11 +8,13 @@ References:
   User modeling and user-adapted interaction, 12(4), 331-370.
 """
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 import logging
 
 from src.services.recommendation.collaborative_filtering import CollaborativeFiltering
 from src.services.recommendation.content_based import ContentBasedFiltering
+from src.utils.ranking import top_k_indices
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +51,8 @@ class HybridRecommendationEngine:
         self.cf_engine = CollaborativeFiltering(n_neighbors=10, min_rating=3.5)
         self.cb_engine = ContentBasedFiltering()
 
-        logger.info(f"Initialized hybrid engine with CF weight={cf_weight}, CB weight={cb_weight}")
+        logger.info("Initialized hybrid engine with CF weight=%s, CB weight=%s",
+                    cf_weight, cb_weight)
 
     def train(self, ratings: List[Dict], products: List[Dict]):
         """
@@ -61,24 +64,32 @@ class HybridRecommendationEngine:
         """
         logger.info("Training hybrid recommendation engine...")
 
-        # Train collaborative filtering
-        if ratings:
-            try:
-                self.cf_engine.train(ratings)
-                logger.info("✅ Collaborative filtering model trained")
-            except Exception as e:
-                logger.error(f"Failed to train CF model: {e}")
-
-        # Train content-based filtering
-        if products:
-            try:
-                self.cb_engine.train(products)
-                logger.info("✅ Content-based filtering model trained")
-            except Exception as e:
-                logger.error(f"Failed to train CB model: {e}")
+        # The two models share no state: train them concurrently (CF is
+        # mostly NumPy/SciPy work, which releases the GIL)
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='hybrid-train') as executor:
+            if ratings:
+                executor.submit(self._train_cf, ratings)
+            if products:
+                executor.submit(self._train_cb, products)
 
         logger.info("Hybrid engine training completed")
 
+    def _train_cf(self, ratings: List[Dict]):
+        """Train collaborative filtering; failures are logged, not raised"""
+        try:
+            self.cf_engine.train(ratings)
+            logger.info("✅ Collaborative filtering model trained")
+        except Exception as e:
+            logger.error("Failed to train CF model: %s", e)
+
+    def _train_cb(self, products: List[Dict]):
+        """Train content-based filtering; failures are logged, not raised"""
+        try:
+            self.cb_engine.train(products)
+            logger.info("✅ Content-based filtering model trained")
+        except Exception as e:
+            logger.error("Failed to train CB model: %s", e)
+
     def normalize_scores(self, recommendations: List[Dict]) -> List[Dict]:
         """
         Normalize scores to [0, 1] range using min-max normalization
@@ -92,28 +103,41 @@ class HybridRecommendationEngine:
         if not recommendations:
             return []
 
-        scores = [r['score'] for r in recommendations]
-        min_score = min(scores)
-        max_score = max(scores)
+        scores = self._min_max_normalize(
+            np.fromiter(
+                (r['score'] for r in recommendations), dtype=np.float64, count=len(recommendations)
+            )
+        )
+        for rec, score in zip(recommendations, scores.tolist()):
+            rec['score'] = score
+
+        return recommendations
+
+    @staticmethod
+    def _min_max_normalize(scores: np.ndarray) -> np.ndarray:
+        """Min-max normalize a score array in place (all 0.5 if the scores are equal)"""
+        if len(scores) == 0:
+            return scores
+
+        min_score = scores.min()
+        max_score = scores.max()
 
         # Avoid division by zero
         if max_score == min_score:
-            for rec in recommendations:
-                rec['score'] = 0.5
-            return recommendations
+            scores.fill(0.5)
+            return scores
 
-        # Min-max normalization
-        for rec in recommendations:
-            rec['score'] = (rec['score'] - min_score) / (max_score - min_score)
-
-        return recommendations
+        scores -= min_score
+        scores /= max_score - min_score
+        return scores
 
     def merge_recommendations(
         self,
         cf_recs: List[Dict],
         cb_recs: List[Dict],
         cf_weight: float,
-        cb_weight: float
+        cb_weight: float,
+        n_recommendations: Optional[int] = None
     ) -> List[Dict]:
         """
         Merge recommendations from CF and CB using weighted average
@@ -123,55 +147,78 @@ class HybridRecommendationEngine:
             cb_recs: Content-based filtering recommendations
             cf_weight: Weight for CF scores
             cb_weight: Weight for CB scores
+            n_recommendations: Only return (and build reasoning for) the
+                               top N; all merged products if None
 
         Returns:
             Merged recommendations sorted by hybrid score
         """
-        # Normalize scores
-        cf_recs_norm = self.normalize_scores(cf_recs.copy())
-        cb_recs_norm = self.normalize_scores(cb_recs.copy())
-
-        # Create score dictionaries
-        cf_scores = {r['product_id']: r for r in cf_recs_norm}
-        cb_scores = {r['product_id']: r for r in cb_recs_norm}
+        # Position of every product in the union, in CF-then-CB order
+        positions = {}
+        for r in cf_recs:
+            positions.setdefault(r['product_id'], len(positions))
+        for r in cb_recs:
+            positions.setdefault(r['product_id'], len(positions))
+        product_ids = list(positions)
+
+        cf_pos = np.fromiter(
+            (positions[r['product_id']] for r in cf_recs), dtype=np.intp, count=len(cf_recs)
+        )
+        cb_pos = np.fromiter(
+            (positions[r['product_id']] for r in cb_recs), dtype=np.intp, count=len(cb_recs)
+        )
 
-        # Get all product IDs
-        all_product_ids = set(cf_scores.keys()).union(set(cb_scores.keys()))
+        # Normalized scores of each method per position (0 where the method
+        # didn't recommend the product), and the index of its entry (-1);
+        # for repeated products the last entry wins
+        cf_scores = np.zeros(len(product_ids))
+        cb_scores = np.zeros(len(product_ids))
+        cf_scores[cf_pos] = self._min_max_normalize(
+            np.fromiter((r['score'] for r in cf_recs), dtype=np.float64, count=len(cf_recs))
+        )
+        cb_scores[cb_pos] = self._min_max_normalize(
+            np.fromiter((r['score'] for r in cb_recs), dtype=np.float64, count=len(cb_recs))
+        )
+        cf_entry = np.full(len(product_ids), -1, dtype=np.intp)
+        cb_entry = np.full(len(product_ids), -1, dtype=np.intp)
+        cf_entry[cf_pos] = np.arange(len(cf_recs))
+        cb_entry[cb_pos] = np.arange(len(cb_recs))
 
-        # Calculate hybrid scores
-        hybrid_recs = []
+        # Weighted average
+        hybrid_scores = cf_weight * cf_scores + cb_weight * cb_scores
 
-        for product_id in all_product_ids:
-            cf_score = cf_scores.get(product_id, {}).get('score', 0.0)
-            cb_score = cb_scores.get(product_id, {}).get('score', 0.0)
+        # Sort by hybrid score (ties keep CF-then-CB order); reasoning is
+        # only built for the returned products
+        k = len(product_ids) if n_recommendations is None else n_recommendations
+        top = top_k_indices(hybrid_scores, k)
 
-            # Weighted average
-            hybrid_score = cf_weight * cf_score + cb_weight * cb_score
+        hybrid_recs = []
 
+        for i, cf_score, cb_score, hybrid_score, cf_i, cb_i in zip(
+            top.tolist(), cf_scores[top].tolist(), cb_scores[top].tolist(),
+            hybrid_scores[top].tolist(), cf_entry[top].tolist(), cb_entry[top].tolist()
+        ):
             # Combine reasoning
             reasoning = {
                 'algorithm': 'hybrid',
                 'cf_weight': cf_weight,
                 'cb_weight': cb_weight,
-                'cf_score': float(cf_score),
-                'cb_score': float(cb_score),
+                'cf_score': cf_score,
+                'cb_score': cb_score,
             }
 
             # Add specific reasoning from each method
-            if product_id in cf_scores:
-                reasoning['cf_reasoning'] = cf_scores[product_id].get('reasoning', {})
-            if product_id in cb_scores:
-                reasoning['cb_reasoning'] = cb_scores[product_id].get('reasoning', {})
+            if cf_i >= 0:
+                reasoning['cf_reasoning'] = cf_recs[cf_i].get('reasoning', {})
+            if cb_i >= 0:
+                reasoning['cb_reasoning'] = cb_recs[cb_i].get('reasoning', {})
 
             hybrid_recs.append({
-                'product_id': product_id,
-                'score': float(hybrid_score),
+                'product_id': product_ids[i],
+                'score': hybrid_score,
                 'reasoning': reasoning,
             })
 
-        # Sort by hybrid score
-        hybrid_recs.sort(key=lambda x: x['score'], reverse=True)
-
         return hybrid_recs
 
     def recommend(
@@ -195,36 +242,11 @@ class HybridRecommendationEngine:
         Returns:
             List of hybrid recommendations
         """
-        logger.info(f"Generating hybrid recommendations for user {user_id}")
+        logger.info("Generating hybrid recommendations for user %s", user_id)
 
-        # Determine if user has cold start problem
-        num_ratings = len(user_ratings)
-        is_cold_start = num_ratings < self.cold_start_threshold
-
-        # Adjust weights based on cold start
-        if is_cold_start:
-            # Cold start: rely more on content-based
-            effective_cf_weight = 0.2
-            effective_cb_weight = 0.8
-            logger.info(f"Cold start detected ({num_ratings} ratings), using CB-heavy weights")
-        else:
-            # Normal case: use configured weights
-            effective_cf_weight = self.cf_weight
-            effective_cb_weight = self.cb_weight
-
-        # Get collaborative filtering recommendations
-        cf_recs = []
-        if num_ratings > 0:
-            try:
-                cf_recs = self.cf_engine.recommend(
-                    user_id=user_id,
-                    user_ratings=user_ratings,
-                    n_recommendations=n_recommendations * 2,  # Get more for merging
-                    exclude_rated=exclude_rated
-                )
-                logger.info(f"CF generated {len(cf_recs)} recommendations")
-            except Exception as e:
-                logger.error(f"CF recommendation failed: {e}")
+        cf_recs = self._cf_recommendations(
+            user_id, user_profile, user_ratings, n_recommendations, exclude_rated
+        )
 
         # Get content-based recommendations
         cb_recs = []
@@ -235,9 +257,104 @@ class HybridRecommendationEngine:
                 n_recommendations=n_recommendations * 2,
                 exclude_products=exclude_products
             )
-            logger.info(f"CB generated {len(cb_recs)} recommendations")
+            logger.info("CB generated %s recommendations", len(cb_recs))
+        except Exception as e:
+            logger.error("CB recommendation failed: %s", e)
+
+        return self._combine(cf_recs, cb_recs, len(user_ratings), n_recommendations)
+
+    def recommend_batch(
+        self,
+        user_profiles: List[Dict],
+        user_ratings: List[List[Dict]],
+        n_recommendations: int = 10,
+        exclude_rated: bool = True
+    ) -> List[List[Dict]]:
+        """
+        Generate hybrid recommendations for many users at once
+
+        Same results as calling recommend() per user, but the content-based
+        scores of all users come from the CB model's recommend_batch (one
+        matrix product per block of users).
+
+        Args:
+            user_profiles: User profile dictionaries (with user_id)
+            user_ratings: Rating history of each user, aligned with user_profiles
+            n_recommendations: Number of recommendations per user
+            exclude_rated: Whether to exclude already rated items
+
+        Returns:
+            One list of hybrid recommendations per user
+        """
+        logger.info("Generating hybrid recommendations for %s users", len(user_profiles))
+
+        try:
+            cb_batch = self.cb_engine.recommend_batch(
+                user_profiles,
+                n_recommendations=n_recommendations * 2,
+                exclude_products=[
+                    [r['product_id'] for r in ratings] if exclude_rated else []
+                    for ratings in user_ratings
+                ]
+            )
         except Exception as e:
-            logger.error(f"CB recommendation failed: {e}")
+            logger.error("CB recommendation failed: %s", e)
+            cb_batch = [[] for _ in user_profiles]
+
+        return [
+            self._combine(
+                self._cf_recommendations(
+                    profile['user_id'], profile, ratings, n_recommendations, exclude_rated
+                ),
+                cb_recs, len(ratings), n_recommendations
+            )
+            for profile, ratings, cb_recs in zip(user_profiles, user_ratings, cb_batch)
+        ]
+
+    def _cf_recommendations(
+        self,
+        user_id: int,
+        user_profile: Dict,
+        user_ratings: List[Dict],
+        n_recommendations: int,
+        exclude_rated: bool
+    ) -> List[Dict]:
+        """Collaborative filtering candidates for merging (none without ratings)"""
+        if not user_ratings:
+            return []
+
+        try:
+            cf_recs = self.cf_engine.recommend(
+                user_id=user_id,
+                user_ratings=user_ratings,
+                n_recommendations=n_recommendations * 2,  # Get more for merging
+                exclude_rated=exclude_rated,
+                skin_type=(user_profile or {}).get('skin_type')
+            )
+            logger.info("CF generated %s recommendations", len(cf_recs))
+            return cf_recs
+        except Exception as e:
+            logger.error("CF recommendation failed: %s", e)
+            return []
+
+    def _combine(
+        self,
+        cf_recs: List[Dict],
+        cb_recs: List[Dict],
+        num_ratings: int,
+        n_recommendations: int
+    ) -> List[Dict]:
+        """Merge CF and CB candidates with weights chosen by the user's rating count"""
+        # Determine if user has cold start problem
+        if num_ratings < self.cold_start_threshold:
+            # Cold start: rely more on content-based
+            effective_cf_weight = 0.2
+            effective_cb_weight = 0.8
+            logger.info("Cold start detected (%s ratings), using CB-heavy weights", num_ratings)
+        else:
+            # Normal case: use configured weights
+            effective_cf_weight = self.cf_weight
+            effective_cb_weight = self.cb_weight
 
         # Handle edge cases
         if not cf_recs and not cb_recs:
@@ -255,9 +372,10 @@ class HybridRecommendationEngine:
         # Merge recommendations
         hybrid_recs = self.merge_recommendations(
             cf_recs, cb_recs,
-            effective_cf_weight, effective_cb_weight
+            effective_cf_weight, effective_cb_weight,
+            n_recommendations
         )
 
-        logger.info(f"Generated {len(hybrid_recs)} hybrid recommendations")
+        logger.info("Generated %s hybrid recommendations", len(hybrid_recs))
 
-        return hybrid_recs[:n_recommendations]
+        return hybrid_recs
@@ -3,8 +3,11 @@ Model Manager
 Handles model versioning, loading, and metadata tracking using joblib
 """
 import os
+import pickle
+import shutil
+import threading
 import joblib
-import json
+import orjson
 from datetime import datetime
 from typing import Optional, Dict
 import logging
@@ -32,7 +35,11 @@ class ModelManager:
         self.models_dir = models_dir
         os.makedirs(models_dir, exist_ok=True)
 
-    def save_model(self, model, version: str, metadata: Optional[Dict] = None):
+        # (directory mtime, list_models result): files are only ever added,
+        # renamed into place or removed, all of which change the mtime
+        self._list_cache = None
+
+    def save_model(self, model, version: str, metadata: Optional[Dict] = None, compress=0):
         """
         Save model with version and metadata
 
@@ -40,6 +47,9 @@ class ModelManager:
             model: Model object to save
             version: Version string (e.g., 'v1.0.0')
             metadata: Optional metadata dictionary
+            compress: joblib compression level/method. Uncompressed by
+                      default, so load_model can memory-map the arrays;
+                      compressed files are smaller but load fully into memory
 
         Returns:
             Path to saved model file
@@ -64,15 +74,21 @@ class ModelManager:
             'metadata': metadata,
         }
 
-        joblib.dump(model_data, model_path)
+        # Written to a temporary file and renamed into place: the file may be
+        # hard-linked as 'latest' and memory-mapped by running loaders, so it
+        # is never rewritten in place
+        tmp_path = f"{model_path}.tmp"
+        joblib.dump(model_data, tmp_path, compress=compress, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, model_path)
 
         # Also save metadata separately as JSON
         metadata_path = model_path.replace('.joblib', '_metadata.json')
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        with open(f"{metadata_path}.tmp", 'wb') as f:
+            f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        os.replace(f"{metadata_path}.tmp", metadata_path)
 
-        logger.info(f"Model saved: {model_path}")
-        logger.info(f"Metadata saved: {metadata_path}")
+        logger.info("Model saved: %s", model_path)
+        logger.info("Metadata saved: %s", metadata_path)
 
         # Update latest symlink
         self._update_latest_link(model_filename)
@@ -96,11 +112,13 @@ class ModelManager:
             model_path = os.path.join(self.models_dir, model_filename)
 
         if not os.path.exists(model_path):
-            logger.error(f"Model not found: {model_path}")
+            logger.error("Model not found: %s", model_path)
             return None, None
 
-        # Load model data
-        model_data = joblib.load(model_path)
+        # Load model data; numpy arrays (the sparse matrices' buffers, neighbor
+        # tables) are read-only memory maps, paged in on demand and shared
+        # between worker processes
+        model_data = joblib.load(model_path, mmap_mode='r')
 
         if isinstance(model_data, dict):
             model = model_data.get('model')
@@ -110,7 +128,8 @@ class ModelManager:
             model = model_data
             metadata = {}
 
-        logger.info(f"Model loaded: {model_path} (version: {metadata.get('version', 'unknown')})")
+        logger.info("Model loaded: %s (version: %s)",
+                    model_path, metadata.get('version', 'unknown'))
 
         return model, metadata
 
@@ -121,14 +140,19 @@ class ModelManager:
         Returns:
             List of model metadata dictionaries
         """
+        mtime = os.stat(self.models_dir).st_mtime_ns
+        cached = self._list_cache
+        if cached is not None and cached[0] == mtime:
+            return [dict(metadata) for metadata in cached[1]]
+
         models = []
 
         for filename in os.listdir(self.models_dir):
             if filename.endswith('_metadata.json'):
                 metadata_path = os.path.join(self.models_dir, filename)
 
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
+                with open(metadata_path, 'rb') as f:
+                    metadata = orjson.loads(f.read())
 
                 metadata['filename'] = filename.replace('_metadata.json', '.joblib')
                 models.append(metadata)
@@ -136,7 +160,9 @@ class ModelManager:
         # Sort by version
         models.sort(key=lambda x: x.get('saved_at', ''), reverse=True)
 
-        return models
+        self._list_cache = (mtime, models)
+
+        return [dict(metadata) for metadata in models]
 
     def get_model_info(self, version: str = 'latest') -> Optional[Dict]:
         """
@@ -155,17 +181,17 @@ class ModelManager:
             metadata_path = os.path.join(self.models_dir, metadata_filename)
 
         if not os.path.exists(metadata_path):
-            logger.warning(f"Metadata not found: {metadata_path}")
+            logger.warning("Metadata not found: %s", metadata_path)
             return None
 
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        with open(metadata_path, 'rb') as f:
+            metadata = orjson.loads(f.read())
 
         return metadata
 
     def _update_latest_link(self, model_filename: str):
         """
-        Update 'latest' symlink to point to newest model
+        Update 'latest' to point to newest model
 
         Args:
             model_filename: Filename of the latest model
@@ -173,26 +199,51 @@ class ModelManager:
         latest_path = os.path.join(self.models_dir, 'recommendation_latest.joblib')
         target_path = os.path.join(self.models_dir, model_filename)
 
-        # Remove existing latest file
-        if os.path.exists(latest_path):
-            os.remove(latest_path)
-
-        # Copy file (symlinks don't work well cross-platform)
-        import shutil
-        shutil.copy2(target_path, latest_path)
+        self._replace_with_link(target_path, latest_path)
 
-        # Also copy metadata
+        # Also link metadata
         latest_meta = latest_path.replace('.joblib', '_metadata.json')
         target_meta = target_path.replace('.joblib', '_metadata.json')
 
-        if os.path.exists(latest_meta):
-            os.remove(latest_meta)
-
         if os.path.exists(target_meta):
-            shutil.copy2(target_meta, latest_meta)
+            self._replace_with_link(target_meta, latest_meta)
+
+        logger.info("Updated 'latest' to point to %s", model_filename)
+
+    @staticmethod
+    def _replace_with_link(target_path: str, link_path: str):
+        """
+        Atomically make link_path a hard link to target_path
+
+        The link is created under a temporary name and renamed over
+        link_path, so readers see either the old or the new file, never a
+        partial one, and no data is copied. Falls back to a copy where hard
+        links are not supported (symlinks don't work well cross-platform).
+        """
+        tmp_path = f"{link_path}.tmp"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+
+        try:
+            os.link(target_path, tmp_path)
+        except OSError:
+            shutil.copy2(target_path, tmp_path)
+
+        os.replace(tmp_path, link_path)
+
+
+# Global model manager instance, created on first use so importing this
+# module doesn't create the models directory
+_model_manager = None
+_model_manager_lock = threading.Lock()
 
-        logger.info(f"Updated 'latest' to point to {model_filename}")
 
+def get_model_manager() -> ModelManager:
+    """Get the global model manager"""
+    global _model_manager
 
-# Global model manager instance
-model_manager = ModelManager()
+    if _model_manager is None:
+        with _model_manager_lock:
+            if _model_manager is None:
+                _model_manager = ModelManager()
+    return _model_manager
@@ -2,16 +2,129 @@
 Recommendation Service
 High-level service providing unified interface to the recommendation engine
 """
+import glob
+import hashlib
 import logging
+import os
+import pickle
+import threading
 from typing import List, Dict, Optional
 from datetime import datetime
 
-from src.config import SessionLocal
-from src.models import User, Product, UserRating, UserConcern, Recommendation
+import joblib
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import joinedload
+
+from src.config import Config, current_session
+from src.models import User, Product, UserRating, Recommendation, ItemSimilarity
+from src.models.base import utcnow
+from src.services.recommendation.collaborative_filtering import RatingColumns
 from src.services.recommendation.hybrid_engine import HybridRecommendationEngine
+from src.utils.cache import get_cached_value, set_cached_value
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip when streaming the whole rating table
+TRAINING_BATCH_SIZE = 10000
+
+# Rating columns the recommendation engine uses
+_RATING_COLUMNS = select(UserRating.user_id, UserRating.product_id, UserRating.rating)
+
+# Training also splits ratings by the reviewer's skin type
+_TRAINING_RATING_COLUMNS = _RATING_COLUMNS.add_columns(UserRating.skin_type_at_review)
+
+# Product columns the content-based model reads (its feature fields that
+# the product listing provides, plus the id)
+_TRAINING_PRODUCT_COLUMNS = select(
+    Product.product_id, Product.category, Product.brand,
+    Product.is_organic, Product.is_cruelty_free, Product.is_vegan, Product.is_fragrance_free
+)
+
+# Bump when the engine's trained state changes shape, so cached engines
+# pickled by older code are not loaded
+MODEL_CACHE_FORMAT = 1
+
+# Fingerprint of the training data, in one round trip: any insert, update
+# or delete of a rating or product changes a count or a latest update time
+_TRAINING_DATA_VERSION = select(
+    select(func.count(UserRating.rating_id)).scalar_subquery(),
+    select(func.max(UserRating.updated_at)).scalar_subquery(),
+    select(func.count(Product.product_id)).scalar_subquery(),
+    select(func.max(Product.updated_at)).scalar_subquery(),
+)
+
+# PostgreSQL advisory lock held while a worker trains, so other worker
+# processes wait for it and load its cached engine instead of training too
+TRAINING_LOCK_ID = 7_316_001
+
+# A user with their concerns, in one query (LEFT OUTER JOIN)
+_USER_WITH_CONCERNS = select(User).options(joinedload(User.concerns))
+
+# User profiles change rarely, cache them for a few minutes. Users are
+# written by scripts, not by this service: the admin data scripts clear the
+# cached profiles, other changes show up once the entry expires
+USER_PROFILE_CACHE_TTL = 300  # seconds
+
+# Version of a user's ratings: any insert, update or delete changes the
+# count or the latest update time, so cached rating lists keyed by it
+# never go stale. Ratings are also written outside this service, so the
+# version is read on every call: a cache hit still costs this one indexed
+# aggregate, and a miss costs it plus the rating query
+_USER_RATINGS_VERSION = select(func.count(UserRating.rating_id), func.max(UserRating.updated_at))
+USER_RATINGS_CACHE_TTL = 3600  # seconds
+
+
+def load_ratings(session, *criteria) -> List[Dict]:
+    """
+    Load ratings as plain dictionaries (user_id, product_id, rating)
+
+    Selects only these three columns and streams the rows in batches, so
+    no ORM objects are built for the (possibly large) rating table.
+
+    Args:
+        session: Database session
+        criteria: Optional WHERE clauses on UserRating
+
+    Returns:
+        List of rating dictionaries, in the order the ratings were made
+    """
+    # Explicit order: recommendation tie-breaks and 'similar_to' follow the
+    # rating history order, which would otherwise depend on the index used
+    stmt = (
+        _RATING_COLUMNS.where(*criteria)
+        .order_by(UserRating.rating_id)
+        .execution_options(yield_per=1000)
+    )
+    return [
+        {
+            'user_id': user_id,
+            'product_id': product_id,
+            'rating': rating,
+        }
+        for user_id, product_id, rating in session.execute(stmt)
+    ]
+
+
+def load_rating_columns(session) -> RatingColumns:
+    """
+    Load all ratings straight into NumPy columns for model training
+
+    Rows are fetched in batches of TRAINING_BATCH_SIZE and packed into NumPy
+    as they arrive; neither ORM objects, per-rating dictionaries nor a list
+    of all rows are built.
+
+    Args:
+        session: Database session
+
+    Returns:
+        RatingColumns with one element per rating, including the reviewer's
+        skin type (for the per skin type CF models)
+    """
+    rows = session.execute(
+        _TRAINING_RATING_COLUMNS.execution_options(yield_per=TRAINING_BATCH_SIZE)
+    )
+    return RatingColumns.from_rows((tuple(row) for row in rows), with_skin_type=True)
+
 
 class RecommendationService:
     """
@@ -22,40 +135,52 @@ class RecommendationService:
     def __init__(self):
         self.engine = HybridRecommendationEngine(cf_weight=0.6, cb_weight=0.4)
         self.is_trained = False
+        # Lets only one thread train a cold service
+        self._train_lock = threading.Lock()
 
     def load_training_data(self, session=None):
         """Load ratings and products from database for training"""
-        close_session = False
         if session is None:
-            session = SessionLocal()
-            close_session = True
+            session = current_session()
 
-        try:
-            # Load all ratings
-            ratings_query = session.query(UserRating).all()
-            ratings = [
-                {
-                    'user_id': r.user_id,
-                    'product_id': r.product_id,
-                    'rating': float(r.rating),
-                }
-                for r in ratings_query
-            ]
+        # Load all ratings (as columns, the CF model's input format)
+        ratings = load_rating_columns(session)
 
-            # Load all products
-            products_query = session.query(Product).all()
-            products = [p.to_dict() for p in products_query]
+        # Load all products (only the columns the models use, streamed in batches)
+        rows = session.execute(
+            _TRAINING_PRODUCT_COLUMNS.execution_options(yield_per=TRAINING_BATCH_SIZE)
+        )
+        products = [row._asdict() for row in rows]
 
-            logger.info(f"Loaded {len(ratings)} ratings and {len(products)} products")
+        logger.info("Loaded %s ratings and %s products", len(ratings), len(products))
 
-            return ratings, products
+        return ratings, products
 
-        finally:
-            if close_session:
-                session.close()
+    def train_models(self, session=None, use_cache=True):
+        """
+        Train recommendation models with data from database
+
+        The trained engine is cached in Config.MODEL_CACHE_DIR under a
+        fingerprint of the training data; while the data is unchanged,
+        later calls (other workers, restarts) load it instead of retraining.
+
+        Args:
+            session: Database session (defaults to the current request's)
+            use_cache: Load a cached engine when one matches the data. The
+                       freshly trained engine is cached either way
+        """
+        if session is None:
+            session = current_session()
+
+        self._lock_training(session)
+
+        cache_path = os.path.join(
+            Config.MODEL_CACHE_DIR, f"hybrid_{self._training_data_version(session)}.joblib"
+        )
+
+        if use_cache and self._load_cached_engine(cache_path):
+            return True
 
-    def train_models(self, session=None):
-        """Train recommendation models with data from database"""
         logger.info("Training recommendation models...")
 
         ratings, products = self.load_training_data(session)
@@ -68,59 +193,168 @@ class RecommendationService:
         self.is_trained = True
 
         logger.info("✅ Models trained successfully")
+
+        self._cache_engine(cache_path)
         return True
 
-    def get_user_profile(self, user_id: int, session=None) -> Optional[Dict]:
-        """Load user profile from database"""
-        close_session = False
-        if session is None:
-            session = SessionLocal()
-            close_session = True
+    def _ensure_trained(self, session=None):
+        """Train (or load the cached engine) once, however many threads ask"""
+        if self.is_trained:
+            return
+
+        with self._train_lock:
+            if not self.is_trained:
+                logger.warning("Models not trained, training now...")
+                self.train_models(session)
+
+    @staticmethod
+    def _lock_training(session):
+        """
+        Serialise training across worker processes (PostgreSQL only)
+
+        A transaction-level advisory lock: released when the session's
+        transaction ends, even if training fails.
+        """
+        if session.get_bind().dialect.name == 'postgresql':
+            session.execute(select(func.pg_advisory_xact_lock(TRAINING_LOCK_ID)))
+
+    @staticmethod
+    def _training_data_version(session) -> str:
+        """Hash identifying the current ratings and products"""
+        version = (MODEL_CACHE_FORMAT, *session.execute(_TRAINING_DATA_VERSION).one())
+        return hashlib.blake2b(repr(version).encode(), digest_size=16).hexdigest()
+
+    def _load_cached_engine(self, cache_path: str) -> bool:
+        """Use the cached engine at cache_path if there is one"""
+        if not os.path.exists(cache_path):
+            return False
 
         try:
-            user = session.query(User).filter(User.user_id == user_id).first()
-            if not user:
-                logger.warning(f"User {user_id} not found")
-                return None
-
-            # Get user concerns
-            concerns = session.query(UserConcern).filter(UserConcern.user_id == user_id).all()
-
-            profile = {
-                'user_id': user.user_id,
-                'username': user.username,
-                'skin_type': user.skin_type,
-                'concerns': [c.to_dict() for c in concerns],
-                'budget_range': user.budget_range,
-            }
+            # Arrays are read-only memory maps, shared between workers
+            self.engine = joblib.load(cache_path, mmap_mode='r')
+        except Exception as e:
+            logger.warning("Could not load cached models %s: %s", cache_path, e)
+            return False
 
+        self.is_trained = True
+        logger.info("✅ Loaded trained models from cache: %s", cache_path)
+        return True
+
+    def _cache_engine(self, cache_path: str):
+        """Write the trained engine to cache_path, removing older cache files"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            # Renamed into place, so other workers never load a partial file
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            joblib.dump(self.engine, tmp_path, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+
+            for path in glob.glob(os.path.join(os.path.dirname(cache_path), 'hybrid_*.joblib')):
+                if path != cache_path:
+                    os.remove(path)
+        except OSError as e:
+            logger.warning("Could not cache trained models: %s", e)
+
+    def save_item_similarities(self, session) -> int:
+        """
+        Replace the stored item similarities with the trained CF neighbour table
+
+        Run after training (scripts/train_recommendation.py), so readers of
+        item_similarity get precomputed neighbours without loading the model.
+
+        Returns:
+            Number of rows stored
+        """
+        rows = self.engine.cf_engine.similarity_rows()
+
+        try:
+            session.execute(delete(ItemSimilarity))
+            ItemSimilarity.bulk_insert(session, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        logger.info("Stored %s item similarities", len(rows))
+        return len(rows)
+
+    def get_similar_products(self, product_id: int, n: int = 10, session=None) -> List[Dict]:
+        """Most similar products of a product, from the stored item similarities"""
+        if session is None:
+            session = current_session()
+
+        rows = session.execute(
+            select(ItemSimilarity.similar_product_id, ItemSimilarity.similarity)
+            .where(ItemSimilarity.product_id == product_id)
+            .order_by(ItemSimilarity.rank)
+            .limit(n)
+        )
+        return [
+            {'product_id': similar_id, 'similarity': similarity}
+            for similar_id, similarity in rows
+        ]
+
+    def get_user_profile(self, user_id: int, session=None) -> Optional[Dict]:
+        """Load user profile from database (cached for USER_PROFILE_CACHE_TTL)"""
+        cache_key = f"profile:{user_id}"
+        profile = get_cached_value(cache_key)
+        if profile is not None:
             return profile
 
-        finally:
-            if close_session:
-                session.close()
+        if session is None:
+            session = current_session()
+
+        user = session.execute(
+            _USER_WITH_CONCERNS.where(User.user_id == user_id)
+        ).unique().scalar_one_or_none()
+        if not user:
+            logger.warning("User %s not found", user_id)
+            return None
+
+        profile = self._profile_dict(user)
+        set_cached_value(cache_key, profile, USER_PROFILE_CACHE_TTL)
+        return profile
+
+    @staticmethod
+    def _profile_dict(user: User) -> Dict:
+        """Profile dictionary the recommendation engine reads (concerns loaded)"""
+        return {
+            'user_id': user.user_id,
+            'username': user.username,
+            'skin_type': user.skin_type,
+            'concerns': [c.to_dict() for c in user.concerns],
+            'budget_range': user.budget_range,
+        }
 
     def get_user_ratings(self, user_id: int, session=None) -> List[Dict]:
-        """Load user's rating history from database"""
-        close_session = False
+        """
+        Load user's rating history from database
+
+        The (product_id, rating) pairs are cached under the user's rating
+        version, so a repeat request only runs the version query (one round
+        trip instead of loading the ratings; a miss runs both).
+        """
         if session is None:
-            session = SessionLocal()
-            close_session = True
+            session = current_session()
 
-        try:
-            ratings = session.query(UserRating).filter(UserRating.user_id == user_id).all()
+        count, latest = session.execute(
+            _USER_RATINGS_VERSION.where(UserRating.user_id == user_id)
+        ).one()
+        cache_key = f"ratings:{user_id}:{count}:{latest.isoformat() if latest else ''}"
+
+        cached_ratings = get_cached_value(cache_key)
+        if cached_ratings is not None:
             return [
-                {
-                    'user_id': r.user_id,
-                    'product_id': r.product_id,
-                    'rating': float(r.rating),
-                }
-                for r in ratings
+                {'user_id': user_id, 'product_id': product_id, 'rating': rating}
+                for product_id, rating in cached_ratings
             ]
 
-        finally:
-            if close_session:
-                session.close()
+        ratings = load_ratings(session, UserRating.user_id == user_id)
+        set_cached_value(
+            cache_key, [[r['product_id'], r['rating']] for r in ratings], USER_RATINGS_CACHE_TTL
+        )
+        return ratings
 
     def generate_recommendations(
         self,
@@ -141,17 +375,14 @@ class RecommendationService:
         Returns:
             List of recommendations with product details
         """
-        if not self.is_trained:
-            logger.warning("Models not trained, training now...")
-            self.train_models()
-
-        session = SessionLocal()
+        session = current_session()
+        self._ensure_trained(session)
 
         try:
             # Get user profile and ratings
             user_profile = self.get_user_profile(user_id, session)
             if not user_profile:
-                logger.error(f"User {user_id} not found")
+                logger.error("User %s not found", user_id)
                 return []
 
             user_ratings = self.get_user_ratings(user_id, session)
@@ -165,20 +396,111 @@ class RecommendationService:
                 exclude_rated=True
             )
 
-            # Enrich recommendations with product details
+            # Enrich recommendations with product details (one query for all products)
+            enriched_recs = self._enrich_recommendations(session, [recommendations])[0]
+
+            # Save to database if requested
+            if save_to_db and enriched_recs:
+                self._save_recommendations({user_id: enriched_recs}, session)
+
+            logger.info("Generated %s recommendations for user %s", len(enriched_recs), user_id)
+
+            return enriched_recs
+
+        except Exception as e:
+            session.rollback()
+            logger.error("Error generating recommendations: %s", e, exc_info=True)
+            return []
+
+    def generate_recommendations_batch(
+        self,
+        user_ids: List[int],
+        n_recommendations: int = 10,
+        save_to_db: bool = True,
+        session=None
+    ) -> Dict[int, List[Dict]]:
+        """
+        Generate recommendations for many users at once (e.g. nightly precomputation)
+
+        Same recommendations as generate_recommendations() per user, but the
+        profiles and ratings of all users are loaded with one query each,
+        the content-based scores come from batched matrix products, product
+        details from one query, and everything is saved with one bulk INSERT.
+
+        Args:
+            user_ids: User IDs (unknown users are left out of the result)
+            n_recommendations: Number of recommendations per user
+            save_to_db: Whether to save recommendations to database
+            session: Database session (defaults to the current request's)
+
+        Returns:
+            Dictionary of user ID -> recommendations with product details
+        """
+        if session is None:
+            session = current_session()
+
+        self._ensure_trained(session)
+
+        users = session.execute(
+            _USER_WITH_CONCERNS.where(User.user_id.in_(user_ids)).order_by(User.user_id)
+        ).unique().scalars().all()
+        user_profiles = [self._profile_dict(user) for user in users]
+
+        # All ratings of these users in one query, split per user (each
+        # user's ratings keep their order, as in get_user_ratings)
+        ratings_by_user = {profile['user_id']: [] for profile in user_profiles}
+        if ratings_by_user:
+            for rating in load_ratings(session, UserRating.user_id.in_(list(ratings_by_user))):
+                ratings_by_user[rating['user_id']].append(rating)
+
+        recommendation_lists = self.engine.recommend_batch(
+            user_profiles,
+            [ratings_by_user[profile['user_id']] for profile in user_profiles],
+            n_recommendations=n_recommendations,
+            exclude_rated=True
+        )
+
+        recommendations_by_user = dict(zip(
+            ratings_by_user, self._enrich_recommendations(session, recommendation_lists)
+        ))
+
+        if save_to_db and any(recommendations_by_user.values()):
+            self._save_recommendations(recommendations_by_user, session)
+
+        logger.info("Generated recommendations for %s users", len(recommendations_by_user))
+
+        return recommendations_by_user
+
+    @staticmethod
+    def _enrich_recommendations(
+        session, recommendation_lists: List[List[Dict]]
+    ) -> List[List[Dict]]:
+        """
+        Attach product details to engine recommendations (one query for all
+        products of all lists); recommendations of unknown products are dropped
+        """
+        product_ids = {rec['product_id'] for recs in recommendation_lists for rec in recs}
+        products_by_id = {
+            row.product_id: Product.row_to_dict(row)
+            for row in session.execute(
+                Product.to_dict_query().where(Product.product_id.in_(product_ids))
+            )
+        } if product_ids else {}
+
+        enriched_lists = []
+
+        for recommendations in recommendation_lists:
             enriched_recs = []
 
             for rec in recommendations:
-                product = session.query(Product).filter(
-                    Product.product_id == rec['product_id']
-                ).first()
+                product = products_by_id.get(rec['product_id'])
 
                 if not product:
                     continue
 
                 enriched_rec = {
                     'recommendation_id': None,  # Will be set if saved to DB
-                    'product': product.to_dict(),
+                    'product': product,
                     'relevance_score': rec['score'],
                     'confidence_score': rec['score'],  # Use same for now
                     'rank': len(enriched_recs) + 1,
@@ -188,69 +510,55 @@ class RecommendationService:
 
                 enriched_recs.append(enriched_rec)
 
-            # Save to database if requested
-            if save_to_db and enriched_recs:
-                self._save_recommendations(user_id, enriched_recs, session)
-
-            logger.info(f"Generated {len(enriched_recs)} recommendations for user {user_id}")
-
-            return enriched_recs
-
-        except Exception as e:
-            logger.error(f"Error generating recommendations: {e}", exc_info=True)
-            return []
-
-        finally:
-            session.close()
+            enriched_lists.append(enriched_recs)
+
+        return enriched_lists
+
+    def _save_recommendations(self, recommendations_by_user: Dict[int, List[Dict]], session):
+        """Save recommendations of one or more users to database (one INSERT)"""
+        rows = [
+            {
+                'user_id': user_id,
+                'product_id': rec['product']['product_id'],
+                'relevance_score': rec['relevance_score'],
+                'confidence_score': rec['confidence_score'],
+                'rank': rec['rank'],
+                'algorithm_used': rec['algorithm_used'],
+                'reasoning': rec['reasoning'],
+            }
+            for user_id, recommendations in recommendations_by_user.items()
+            for rec in recommendations
+        ]
 
-    def _save_recommendations(self, user_id: int, recommendations: List[Dict], session):
-        """Save recommendations to database"""
         try:
-            for rec in recommendations:
-                db_rec = Recommendation(
-                    user_id=user_id,
-                    product_id=rec['product']['product_id'],
-                    relevance_score=rec['relevance_score'],
-                    confidence_score=rec['confidence_score'],
-                    rank=rec['rank'],
-                    algorithm_used=rec['algorithm_used'],
-                    reasoning=rec['reasoning'],
-                    recommended_at=datetime.utcnow(),
-                )
-                session.add(db_rec)
+            # recommended_at is evaluated once by the database for the whole batch
+            Recommendation.bulk_insert(session, rows, recommended_at=utcnow())
 
             session.commit()
-            logger.info(f"Saved {len(recommendations)} recommendations to database")
+            logger.info("Saved %s recommendations to database", len(rows))
 
         except Exception as e:
             session.rollback()
-            logger.error(f"Error saving recommendations: {e}")
+            logger.error("Error saving recommendations: %s", e)
 
     def record_feedback(self, recommendation_id: int, feedback: str, session=None):
         """Record user feedback on a recommendation"""
-        close_session = False
         if session is None:
-            session = SessionLocal()
-            close_session = True
+            session = current_session()
 
-        try:
-            rec = session.query(Recommendation).filter(
-                Recommendation.recommendation_id == recommendation_id
-            ).first()
-
-            if rec:
-                rec.feedback = feedback
-                rec.feedback_timestamp = datetime.utcnow()
-                session.commit()
-                logger.info(f"Recorded feedback '{feedback}' for recommendation {recommendation_id}")
-                return True
-            else:
-                logger.warning(f"Recommendation {recommendation_id} not found")
-                return False
-
-        finally:
-            if close_session:
-                session.close()
+        rec = session.query(Recommendation).filter(
+            Recommendation.recommendation_id == recommendation_id
+        ).first()
+
+        if rec:
+            rec.feedback = feedback
+            rec.feedback_timestamp = datetime.utcnow()
+            session.commit()
+            logger.info("Recorded feedback '%s' for recommendation %s", feedback, recommendation_id)
+            return True
+        else:
+            logger.warning("Recommendation %s not found", recommendation_id)
+            return False
 
 
 # Global service instance
@@ -0,0 +1,136 @@
+"""
+Skincare Catalog
+Column-oriented in-memory view of the crawled skincare products
+"""
+import logging
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from src.config import SessionLocal
+from src.models.skincare_product import SkincareProduct
+from src.utils.keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = 'models/skincare_ml'
+
+# Platform codes used in SkincareCatalog.platform (0 = other/unknown)
+PLATFORM_CODES = {'JD': 1, 'TB': 2}
+PLATFORM_JD = PLATFORM_CODES['JD']
+PLATFORM_TB = PLATFORM_CODES['TB']
+
+# 功效分类关键词
+EFFECTS_CATEGORIES = {
+    '美白提亮': ['美白', '提亮', '去黄', '淡斑'],
+    '补水保湿': ['补水', '保湿', '滋润', '水润'],
+    '抗衰老': ['抗皱', '紧致', '提拉', '淡纹', '抗氧化'],
+    '修护舒缓': ['修护', '舒缓', '修复', '镇静'],
+    '控油清洁': ['控油', '清爽', '洁面', '去油']
+}
+EFFECT_NAMES = list(EFFECTS_CATEGORIES)
+
+# 所有功效关键词一次匹配
+_EFFECT_MATCHER = KeywordMatcher(kw for keywords in EFFECTS_CATEGORIES.values() for kw in keywords)
+
+
+def tag_effects(names):
+    """
+    Boolean matrix (len(names), len(EFFECT_NAMES)): True where the name
+    contains any keyword of that effect category
+    """
+    tags = np.zeros((len(names), len(EFFECT_NAMES)), dtype=bool)
+    for row, name in enumerate(names):
+        matched = _EFFECT_MATCHER.find(name)
+        if matched:
+            for col, effect_name in enumerate(EFFECT_NAMES):
+                tags[row, col] = any(kw in matched for kw in EFFECTS_CATEGORIES[effect_name])
+    return tags
+
+
+class SkincareCatalog:
+    """
+    Skincare products stored as parallel NumPy columns
+
+    Row i of every column describes ``products[i]``; the original product
+    dicts are kept for building responses. Prices and recommendation scores
+    stay float64 so averages match the values computed from the dicts.
+    Effect categories are tagged once at load time (``effect_tags``).
+    """
+
+    def __init__(self, products, version=None):
+        self.products = products
+        self.version = version
+
+        n = len(products)
+        self.serial = np.fromiter((p['序号'] for p in products), dtype=np.int64, count=n)
+        self.price = np.fromiter((p['价格'] for p in products), dtype=np.float64, count=n)
+        self.rec = np.fromiter((p['推荐程度'] for p in products), dtype=np.float64, count=n)
+        self.platform = np.fromiter(
+            (PLATFORM_CODES.get(p['平台'], 0) for p in products), dtype=np.uint8, count=n
+        )
+        self.name = np.array([p['名称'] for p in products], dtype=object)
+        self.effect_tags = tag_effects(self.name)
+
+    def __len__(self):
+        return len(self.products)
+
+    def take(self, indices):
+        """Product dicts for the given row indices, in order"""
+        products = self.products
+        return [products[i] for i in indices]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _load_from_database():
+    """Build the product list from the skincare_products table"""
+    session = SessionLocal()
+    try:
+        products_query = session.query(
+            SkincareProduct.序号, SkincareProduct.平台, SkincareProduct.名称, SkincareProduct.价格,
+            SkincareProduct.推荐程度, SkincareProduct.用户评价数, SkincareProduct.用户购买数
+        ).all()
+        return [{
+            '序号': p.序号,
+            '平台': p.平台,
+            '名称': p.名称,
+            '价格': float(p.价格) if p.价格 else 0.0,
+            '推荐程度': float(p.推荐程度) if p.推荐程度 else 0.0,
+            '用户评价数': p.用户评价数,
+            '用户购买数': p.用户购买数
+        } for p in products_query]
+    finally:
+        session.close()
+
+
+def get_skincare_catalog(model_dir=MODEL_DIR):
+    """
+    Get the skincare catalog
+
+    Loaded from ``products_data.pkl`` and cached until the file's mtime
+    changes. Without the pickle the catalog is read from the database on
+    every call and has ``version=None``.
+    """
+    global _catalog
+
+    path = os.path.join(model_dir, 'products_data.pkl')
+    if not os.path.exists(path):
+        return SkincareCatalog(_load_from_database())
+
+    version = os.path.getmtime(path)
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            with open(path, 'rb') as f:
+                products = pickle.load(f)
+            _catalog = SkincareCatalog(products, version=version)
+            logger.info("Loaded skincare catalog (%s products)", len(products))
+        return _catalog
@@ -0,0 +1,72 @@
+"""
+Skincare Name Features
+TF-IDF feature text extracted from skincare product names
+
+Shared by the training scripts and the ML API, so products and user
+preferences are tokenised identically.
+"""
+import jieba
+
+from src.utils.keyword_matcher import KeywordMatcher
+
+# 名称特征关键词，按类别顺序输出
+FEATURE_KEYWORDS = [
+    # 1. 品牌关键词
+    ('品牌', [
+        '欧莱雅', '谷雨', '海蓝之谜', 'LA MER', '妮维雅', 'NIVEA',
+        '科颜氏', "Kiehl's", '自然堂', '兰蔻', '雅诗兰黛', '资生堂',
+        '欧诗漫', '百雀羚', '大宝', '韩束', '珀莱雅', '袋鼠妈妈',
+        '青蛙王子', '隆力奇', '蜜沐聆'
+    ]),
+    # 2. 功效关键词
+    ('功效', [
+        '美白', '保湿', '补水', '抗皱', '紧致', '淡斑', '祛斑',
+        '修护', '滋润', '提亮', '去黄', '抗氧化', '淡纹', '控油',
+        '舒缓', '提拉', '焕肤', '嫩肤', '御龄'
+    ]),
+    # 3. 产品类型
+    ('类型', [
+        '面霜', '乳液', '精华', '水乳', '套装', '礼盒', '洁面',
+        '爽肤水', '晚霜', '日霜', '眼霜', '护手霜', '身体乳',
+        '面膜', '精萃水', '凝露', '凝胶'
+    ]),
+    # 4. 适用人群
+    ('人群', ['男士', '女', '孕妇', '儿童', '宝宝', '婴儿', '准孕妇']),
+    # 5. 规格相关
+    ('规格', ['套装', '礼盒', '旅行装', '小样', '正装']),
+]
+
+# jieba 分词结果中忽略的词
+STOP_WORDS = frozenset(['的', '和', '与', '或'])
+
+
+class NameFeatureExtractor:
+    """
+    从商品名称中提取特征文本
+
+    关键词特征按 (类别, 关键词列表) 的顺序输出，所有关键词编译为一个匹配器，
+    名称只扫描一次；之后追加 jieba 分词得到的前5个有效词。
+    """
+
+    def __init__(self, feature_keywords):
+        # (特征名, 关键词)，保持输出顺序
+        self._feature_order = [
+            (f'{category}_{kw}', kw) for category, keywords in feature_keywords for kw in keywords
+        ]
+        self._matcher = KeywordMatcher(kw for _, kw in self._feature_order)
+
+    def __call__(self, name):
+        # 1-5. 关键词特征：一次扫描找出名称中出现的全部关键词
+        found = self._matcher.find(name)
+        features = [feature for feature, kw in self._feature_order if kw in found] if found else []
+
+        # 6. 使用jieba分词提取其他关键词
+        words = jieba.cut(name)
+        meaningful_words = [w for w in words if len(w) >= 2 and w not in STOP_WORDS]
+        features.extend(meaningful_words[:5])  # 只取前5个词
+
+        return ' '.join(features) if features else name
+
+
+# 线上模型（scripts/train_skincare_ml.py 训练）使用的特征提取
+extract_name_features = NameFeatureExtractor(FEATURE_KEYWORDS)
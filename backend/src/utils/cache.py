@@ -0,0 +1,189 @@
+"""
+Caching Utilities
+Redis-backed response caching, in-process caches and cache-key helpers
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import orjson
+import redis
+from flask import Response, current_app, request
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'cache'
+
+# Initialize Redis client
+try:
+    redis_client = redis.from_url(config.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+except Exception as e:
+    logger.warning("Redis cache unavailable: %s", e)
+    redis_client = None
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry expiry
+
+    Entries expire ``ttl`` seconds after they are set; when the cache is
+    full the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing/expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Cache value under key (ttl overrides the cache default)"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+
+
+def make_cache_key(*parts):
+    """
+    Stable hex digest of JSON-serialisable parts
+
+    Used both as cache key and as HTTP ETag.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# Used when Redis is not reachable, so caching still works per process
+_local_cache = TTLCache(maxsize=1024, ttl=300)
+
+# After a Redis error, skip Redis for a while instead of paying a timeout per request
+REDIS_RETRY_INTERVAL = 30  # seconds
+_redis_retry_at = 0.0
+
+
+def _redis_available():
+    return redis_client is not None and time.monotonic() >= _redis_retry_at
+
+
+def _redis_failed(e):
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+    logger.warning("Redis cache error, using local cache for %ss: %s", REDIS_RETRY_INTERVAL, e)
+
+
+def _cache_get(key):
+    if _redis_available():
+        try:
+            return redis_client.get(key)
+        except redis.RedisError as e:
+            _redis_failed(e)
+    return _local_cache.get(key)
+
+
+def _cache_set(key, value, ttl):
+    if _redis_available():
+        try:
+            redis_client.setex(key, ttl, value)
+            return
+        except redis.RedisError as e:
+            _redis_failed(e)
+    _local_cache.set(key, value, ttl)
+
+
+def get_cached_value(key):
+    """
+    Value stored with set_cached_value, or None if missing/expired
+
+    Every call returns a fresh copy, so callers may modify it.
+    """
+    data = _cache_get(f"{CACHE_KEY_PREFIX}:{key}")
+    return orjson.loads(data) if data is not None else None
+
+
+def set_cached_value(key, value, ttl=300):
+    """Cache a JSON-serialisable value (Redis, or per process without Redis)"""
+    _cache_set(f"{CACHE_KEY_PREFIX}:{key}", orjson.dumps(value), ttl)
+
+
+def cached(namespace, ttl=120):
+    """
+    Decorator to cache successful JSON responses of a GET endpoint
+
+    The key is built from the namespace, request path and query string, so
+    every parameter combination is cached separately. Responses are stored
+    in Redis with the given TTL (seconds), or in a per-process cache when
+    Redis is unavailable.
+
+    Usage:
+        @skincare_bp.route('/skincare/analytics')
+        @cached('skincare', ttl=120)
+        def get_skincare_analytics():
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (
+                f"{CACHE_KEY_PREFIX}:{namespace}:"
+                f"{make_cache_key(request.path, sorted(request.args.items(multi=True)))}"
+            )
+
+            body = _cache_get(key)
+            if body is not None:
+                return Response(body, status=200, mimetype='application/json')
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                _cache_set(key, response.get_data(), ttl)
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def invalidate_cache(namespace):
+    """
+    Drop all cached responses in a namespace (e.g. after a data import)
+
+    Per-process fallback entries of other processes expire with their TTL.
+    """
+    _local_cache.clear()
+
+    if redis_client is None:
+        return
+
+    try:
+        keys = list(redis_client.scan_iter(match=f"{CACHE_KEY_PREFIX}:{namespace}:*", count=500))
+        if keys:
+            redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning("Failed to invalidate cache namespace '%s': %s", namespace, e)
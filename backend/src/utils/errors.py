@@ -15,7 +15,14 @@ class APIError(Exception):
         self.message = message
         self.status_code = status_code
         self.payload = payload or {}
-        self.trace_id = str(uuid.uuid4())
+        self._trace_id = None
+
+    @property
+    def trace_id(self):
+        """Trace ID of this error, generated on first use (only 5xx responses show it)"""
+        if self._trace_id is None:
+            self._trace_id = str(uuid.uuid4())
+        return self._trace_id
 
     def to_dict(self):
         """Convert exception to dictionary for JSON response"""
@@ -90,7 +97,7 @@ def register_error_handlers(app):
 
         # Log server errors
         if error.status_code >= 500:
-            logging.error(f"APIError [{error.trace_id}]: {error.message}", exc_info=True)
+            logging.error("APIError [%s]: %s", error.trace_id, error.message, exc_info=True)
 
         return response
 
@@ -113,7 +120,7 @@ def register_error_handlers(app):
     def internal_server_error(e):
         """Handle internal server errors"""
         trace_id = str(uuid.uuid4())
-        logging.error(f"Internal Server Error [{trace_id}]: {str(e)}", exc_info=True)
+        logging.error("Internal Server Error [%s]: %s", trace_id, e, exc_info=True)
         return jsonify({
             'error': 'Internal server error',
             'trace_id': trace_id
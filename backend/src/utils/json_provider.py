@@ -0,0 +1,45 @@
+"""
+JSON Provider
+orjson-backed replacement for Flask's default JSON provider
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Serialise jsonify()/request.get_json() with orjson
+
+    Output matches the default provider: keys are sorted, non-ASCII text is
+    emitted as UTF-8 rather than escaped, and dates, Decimals and UUIDs go
+    through Flask's default hook. NumPy arrays and scalars are serialised
+    natively. Calls with extra json.dumps/loads arguments fall back to the
+    stdlib implementation.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _dumps_bytes(self, obj, indent=False):
+        option = self.option
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self._dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype
+        )
@@ -0,0 +1,56 @@
+"""
+Keyword Matching Utilities
+Multi-keyword substring matching in a single pass over the text
+"""
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of keywords occur in a text.
+
+    All keywords are compiled into one alternation, so each text is scanned
+    once instead of once per keyword. The result is identical to testing
+    ``keyword in text`` for every keyword.
+    """
+
+    def __init__(self, keywords):
+        # De-duplicate while keeping the caller's order
+        self.keywords = tuple(dict.fromkeys(kw for kw in keywords if kw))
+
+        # Longest first, so the lookahead reports the longest keyword starting
+        # at each position; shorter keywords inside it are added from _contained
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = re.compile(
+            '(?=(%s))' % '|'.join(re.escape(kw) for kw in ordered)
+        ) if ordered else None
+
+        self._contained = {
+            kw: frozenset(other for other in self.keywords if other in kw)
+            for kw in self.keywords
+        }
+
+    def find(self, text):
+        """Return the set of keywords that occur in text"""
+        found = set()
+        if not text or self._pattern is None:
+            return found
+
+        for match in self._pattern.finditer(text):
+            keyword = match.group(1)
+            if keyword not in found:
+                found |= self._contained[keyword]
+
+        return found
+
+
+@lru_cache(maxsize=256)
+def get_keyword_matcher(keywords):
+    """
+    Get a (cached) matcher for a tuple of keywords
+
+    Request-supplied keyword lists repeat a lot, so matchers are reused
+    instead of recompiled on every call.
+    """
+    return KeywordMatcher(keywords)
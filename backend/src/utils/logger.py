@@ -2,11 +2,16 @@
 Logging Configuration
 Centralized logging setup for the application
 """
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from src.config import config
 
+# Writes the queued records to the file and console handlers
+_queue_listener = None
+
 
 def setup_logging(app=None):
     """
@@ -47,6 +52,19 @@ def setup_logging(app=None):
         '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
     ))
 
+    # Request threads only merge each record's message (QueueHandler.prepare,
+    # including any traceback text) and put it on a queue; a background
+    # thread applies the handlers' formats and writes, so a slow disk flush
+    # never stalls a request
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+    log_queue = queue.SimpleQueue()
+    _queue_listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
+
     # Get root logger
     logger = logging.getLogger()
     logger.setLevel(log_level)
@@ -54,20 +72,24 @@ def setup_logging(app=None):
     # Remove existing handlers
     logger.handlers.clear()
 
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Add handler
+    logger.addHandler(QueueHandler(log_queue))
 
-    # Configure Flask app logger if provided
+    # Configure Flask app logger if provided (its records reach the root handler)
     if app:
         app.logger.setLevel(log_level)
         app.logger.handlers.clear()
-        app.logger.addHandler(file_handler)
-        app.logger.addHandler(console_handler)
 
     logging.info("Logging initialized successfully")
 
 
+@atexit.register
+def _stop_queue_listener():
+    """Write out the records still queued when the process exits"""
+    if _queue_listener is not None:
+        _queue_listener.stop()
+
+
 def get_logger(name):
     """
     Get a logger instance
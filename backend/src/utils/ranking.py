@@ -0,0 +1,75 @@
+"""
+Ranking Utilities
+Top-K selection over NumPy score arrays
+"""
+import numpy as np
+
+
+def top_k_indices(scores, k, tiebreak=None):
+    """
+    Indices of the k highest scores, best first
+
+    Uses a partial partition so only the candidates that can reach the
+    top k are sorted. Ties are broken by ``tiebreak`` (higher first) and
+    then by position, so the result matches a stable descending sort.
+
+    Args:
+        scores: 1-D array of scores
+        k: Number of indices to return
+        tiebreak: Optional 1-D array used as secondary sort key
+
+    Returns:
+        Array of at most k indices into scores
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        # Every score >= the k-th largest is a candidate (keeps all ties)
+        threshold = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(n)
+
+    if tiebreak is None:
+        order = np.argsort(-scores[candidates], kind='stable')
+    else:
+        order = np.lexsort((-np.asarray(tiebreak)[candidates], -scores[candidates]))
+
+    return candidates[order[:k]]
+
+
+def top_k_neighbors(matrix, k, block_size=1024):
+    """
+    Top-k most similar rows for every row of an L2-normalised sparse matrix
+
+    Similarities are computed a block of rows at a time, so memory stays
+    at ``block_size`` x n_rows. A row is never its own neighbour; rows with
+    fewer than k other rows are padded with index -1 and score -inf.
+
+    Args:
+        matrix: scipy.sparse matrix with L2-normalised rows
+        k: Number of neighbours per row
+        block_size: Rows per similarity block
+
+    Returns:
+        (indices, scores): int32 and float32 arrays of shape (n_rows, k),
+        best first
+    """
+    matrix = matrix.tocsr()
+    n = matrix.shape[0]
+    indices = np.full((n, k), -1, dtype=np.int32)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+    transposed = matrix.T.tocsc()
+
+    for start in range(0, n, block_size):
+        block = (matrix[start:start + block_size] @ transposed).toarray()
+        for offset, row in enumerate(block):
+            row[start + offset] = -np.inf
+            top = top_k_indices(row, min(k, n - 1))
+            indices[start + offset, :len(top)] = top
+            scores[start + offset, :len(top)] = row[top]
+
+    return indices, scores
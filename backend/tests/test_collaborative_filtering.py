@@ -0,0 +1,64 @@
+"""
+Tests for the item-based collaborative filtering engine
+"""
+from src.services.recommendation import collaborative_filtering
+from src.services.recommendation.collaborative_filtering import (
+    CollaborativeFiltering, RatingColumns
+)
+from src.utils.ranking import top_k_neighbors
+
+
+def _opposed_ratings():
+    """Users 1-2 like item 1 and dislike item 2; user 3 rates items 3-4 alike"""
+    return (
+        [{'user_id': user_id, 'product_id': 1, 'rating': 5.0} for user_id in (1, 2)]
+        + [{'user_id': user_id, 'product_id': 2, 'rating': 1.0} for user_id in (1, 2)]
+        + [{'user_id': 3, 'product_id': product_id, 'rating': 3.0} for product_id in (3, 4)]
+    )
+
+
+def test_non_positive_similarities_are_not_neighbours():
+    cf = CollaborativeFiltering()
+    cf.train(_opposed_ratings())
+
+    # Item 2 is anti-correlated with item 1, items 3-4 are unrelated to it
+    assert cf.get_item_similarities(1) == []
+    # Items with all-equal centred ratings are similar to nothing
+    assert cf.get_item_similarities(3) == []
+    assert cf.similarity_rows() == []
+
+
+def test_recommend_skips_non_positive_similarities():
+    cf = CollaborativeFiltering()
+    cf.train(_opposed_ratings())
+
+    recommendations = cf.recommend(9, [{'product_id': 1, 'rating': 5.0}])
+
+    assert recommendations == []
+
+
+def test_retraining_with_skin_types_reuses_every_table(monkeypatch):
+    skin_types = ('oily', 'dry', 'combination', 'normal', 'sensitive')
+    rows = [
+        (user_id, product_id, float(1 + (user_id * product_id) % 5), skin_types[user_id % 5])
+        for user_id in range(100)
+        for product_id in range(10)
+    ]
+    ratings = RatingColumns.from_rows(rows, count=len(rows), with_skin_type=True)
+
+    calls = []
+
+    def counting_top_k_neighbors(*args, **kwargs):
+        calls.append(1)
+        return top_k_neighbors(*args, **kwargs)
+
+    monkeypatch.setattr(collaborative_filtering, 'top_k_neighbors', counting_top_k_neighbors)
+    collaborative_filtering._fit_cache.clear()
+
+    for _ in range(3):
+        cf = CollaborativeFiltering()
+        cf.train(ratings)
+        assert len(cf.segment_models) == len(skin_types)
+
+    # Global model plus one per skin type, computed by the first training only
+    assert len(calls) == 1 + len(skin_types)
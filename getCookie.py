@@ -2,49 +2,63 @@ from playwright.async_api import async_playwright
 import asyncio
 import json
 
-async def JD():
+LAUNCH_ARGS = [  # ③ 关闭 WebGL 等指纹
+    "--disable-blink-features=AutomationControlled",
+    "--disable-web-security",
+    "--disable-features=VizDisplayCompositor",
+    "--no-sandbox",
+    "--disable-dev-shm-usage"
+]
+
+# (首页, Cookie文件, 登录后才有的Cookie名)
+JD_SITE = ("https://www.jd.com/", './cookie.json', 'thor')
+TB_SITE = ("https://www.taobao.com/", './cookie_tb.json', 'unb')
+
+# 最多等待的秒数（留给手动登录），登录Cookie出现后立即保存
+COOKIE_TIMEOUT = 15
+
+
+async def wait_for_cookie(context, name, timeout=COOKIE_TIMEOUT):
+    """轮询直到出现指定Cookie或超时"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if any(c['name'] == name for c in await context.cookies()):
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def fetch_site(browser, url, out, cookie_name):
+    # 每个站点独立的 context，Cookie 互不影响
+    context = await browser.new_context()
+    page = await context.new_page()
+    await page.goto(url)
+    await wait_for_cookie(context, cookie_name)
+    cookie = await context.cookies()
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(cookie, f, ensure_ascii=False, indent=4)
+    await context.close()
+    return cookie
+
+
+async def fetch_cookies(sites):
+    """只启动一次浏览器，同时获取各站点的Cookie"""
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=False,
-                                                   args=[  # ③ 关闭 WebGL 等指纹
-                                                       "--disable-blink-features=AutomationControlled",
-                                                       "--disable-web-security",
-                                                       "--disable-features=VizDisplayCompositor",
-                                                       "--no-sandbox",
-                                                       "--disable-dev-shm-usage"
-                                                   ]
-                                                   )
-        context = await browser.new_context()
-        page = await context.new_page()
-        await page.goto(
-            "https://www.jd.com/")
-        await asyncio.sleep(15)
-        cookie = await context.cookies()
-        with open('./cookie.json', 'w', encoding='utf-8') as f:
-            json.dump(cookie, f, ensure_ascii=False, indent=4)
-        await browser.close()
-        return cookie
+        browser = await playwright.chromium.launch(headless=False, args=LAUNCH_ARGS)
+        try:
+            return await asyncio.gather(*[fetch_site(browser, *site) for site in sites])
+        finally:
+            await browser.close()
+
+
+async def JD():
+    return (await fetch_cookies([JD_SITE]))[0]
+
 
 async def TB():
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=False,
-                                                   args=[  # ③ 关闭 WebGL 等指纹
-                                                       "--disable-blink-features=AutomationControlled",
-                                                       "--disable-web-security",
-                                                       "--disable-features=VizDisplayCompositor",
-                                                       "--no-sandbox",
-                                                       "--disable-dev-shm-usage"
-                                                   ]
-                                                   )
-        context = await browser.new_context()
-        page = await context.new_page()
-        await page.goto("https://www.taobao.com/")
-        await asyncio.sleep(15)
-        cookie = await context.cookies()
-        with open('./cookie_tb.json', 'w', encoding='utf-8') as f:
-            json.dump(cookie, f, ensure_ascii=False, indent=4)
-        await browser.close()
-        return cookie
+    return (await fetch_cookies([TB_SITE]))[0]
 
 
 if __name__ == '__main__':
-    asyncio.run(TB())
\ No newline at end of file
+    asyncio.run(fetch_cookies([JD_SITE, TB_SITE]))
\ No newline at end of file